@@ -3,7 +3,18 @@ import logging
 import sys
 from bot.core.loader import bot, dp, settings
 from bot.core.database import engine, Base
-from bot.middlewares import AuthMiddleware, ChatManagementMiddleware
+from bot.core.redis import redis_client
+from bot.core.invalidation import bus as invalidation_bus
+from bot.core.metrics import log_metrics
+from bot.core.webhook import run_webhook
+from bot.core.streams import UpdateProducer, UpdateConsumer, run_polling_ingest, worker_shards
+from bot.services.filter_set import migrate_smart_regex_filters
+from bot.services import chat_registry, chat_settings
+from bot.services.log_writer import log_writer
+from bot.services.punishment import dispatcher as punishment_dispatcher
+from bot.services.regex_guard import regex_sandbox
+from bot.services.albums import album_buffer
+from bot.middlewares import AuthMiddleware, ChatManagementMiddleware, DatabaseMiddleware
 from bot.handlers.admin import menu, filters, settings as admin_settings, stats, logs
 from bot.handlers.moderation import messages
 from bot.handlers import events
@@ -14,10 +25,56 @@ async def on_startup():
         await conn.run_sync(Base.metadata.create_all)
     logging.info("Database initialized")
 
+    # Smart filters used to be stored as generated regexes
+    migrated = await migrate_smart_regex_filters()
+    if migrated:
+        logging.info(f"Migrated {migrated} smart regex filters")
+
+    known_chats = await chat_registry.warm_up()
+    logging.info(f"Loaded {known_chats} known chats")
+
+    cached_settings = await chat_settings.warm_up()
+    logging.info(f"Cached settings of {cached_settings} chats")
+
+    # Cache invalidations from other instances
+    invalidation_bus.start()
+
+    # Workers for risky regex filters
+    regex_sandbox.start()
+
+    log_writer.start()
+    punishment_dispatcher.start()
+
+    if settings.METRICS_LOG_INTERVAL:
+        asyncio.create_task(log_metrics(settings.METRICS_LOG_INTERVAL))
+
+async def run_ingest():
+    producer = UpdateProducer(redis_client)
+    if settings.INGEST_SOURCE == "webhook":
+        await run_webhook(bot, dp, producer)
+    else:
+        await run_polling_ingest(bot, dp, producer)
+
+async def run_updates():
+    if settings.BOT_MODE == "webhook":
+        await run_webhook(bot, dp)
+    elif settings.BOT_MODE == "ingest":
+        await run_ingest()
+    elif settings.BOT_MODE == "worker":
+        await UpdateConsumer(redis_client, bot, dp, worker_shards()).run()
+    elif settings.BOT_MODE == "sharded":
+        # Single host: ingest and all shard consumers in one process
+        consumer = UpdateConsumer(redis_client, bot, dp, list(range(settings.STREAM_SHARDS)))
+        await asyncio.gather(run_ingest(), consumer.run())
+    else:
+        await dp.start_polling(bot)
+
 async def main():
     logging.basicConfig(level=settings.LOG_LEVEL, stream=sys.stdout)
     
     # Register Middlewares
+    # One lazily opened DB session per update, shared by everything below
+    dp.update.outer_middleware(DatabaseMiddleware())
     dp.message.middleware(ChatManagementMiddleware())
     dp.message.middleware(AuthMiddleware())
     dp.callback_query.middleware(AuthMiddleware())
@@ -34,8 +91,16 @@ async def main():
     # Startup
     await on_startup()
     
-    logging.info("Bot started")
-    await dp.start_polling(bot)
+    logging.info(f"Bot started ({settings.BOT_MODE})")
+    try:
+        await run_updates()
+    finally:
+        # Finish queued punishments and flush violation logs before exiting
+        await album_buffer.stop()
+        await punishment_dispatcher.stop()
+        await log_writer.stop()
+        await invalidation_bus.stop()
+        regex_sandbox.stop()
 
 if __name__ == "__main__":
     try:
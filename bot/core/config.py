@@ -22,6 +22,92 @@ class Settings(BaseSettings):
     REDIS_PORT: int | None = None
     REDIS_DB: int | None = None
     USE_REDIS: bool = True
+    # In-memory fallback when Redis is not configured
+    MEMORY_CACHE_MAX_ENTRIES: int = 100000
+    MEMORY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024 # Approximate, least recently used keys are evicted first
+    MEMORY_CACHE_MAX_STREAM_BYTES: int = 64 * 1024 * 1024 # Approximate, for in-memory update streams, oldest entries are trimmed first
+    # Local copies of hot Redis keys (db_synced:, admin rosters)
+    NEAR_CACHE_SIZE: int = 100000
+    NEAR_CACHE_TTL: float = 10 # Seconds
+    NEAR_CACHE_NEGATIVE_TTL: float = 2 # Seconds, for keys missing in Redis
+    INVALIDATION_CHANNEL: str = "guard:invalidate" # Pub/sub channel shared by all instances
+    # Admin rosters (one get_chat_administrators call per chat)
+    ADMIN_ROSTER_TTL: int = 3600 # Seconds, kept up to date by chat_member events meanwhile
+    ADMIN_ROSTER_FAILURE_TTL: float = 30 # Seconds, a chat whose roster failed to load is not retried sooner
+    ADMIN_CHECK_LOCK: bool = False # One roster fetch per chat across instances, through a Redis lock
+    ADMIN_CHECK_LOCK_TIMEOUT: float = 5 # Seconds
+
+    # In-process caches
+    FILTER_CACHE_SIZE: int = 1000 # Max chats with compiled filters kept in memory
+    FILTER_CACHE_TTL: int = 300 # Seconds, safety net for changes made by other instances
+    SETTINGS_CACHE_SIZE: int = 10000 # Max chats with a settings snapshot kept in memory
+    SETTINGS_CACHE_TTL: int = 600 # Seconds
+    KNOWN_CHATS_CACHE_SIZE: int = 100000 # Chats known to have a guard_chats row, the rest is checked in Redis
+    VERDICT_CACHE_SIZE: int = 100000 # Content filter outcomes of recently seen texts, shared by chats
+    VERDICT_CACHE_TTL: int = 300 # Seconds
+    FILTER_STATS_MAX_CHATS: int = 10000 # Chats with per-filter cost and hit counters
+    FILTER_REORDER_EVERY: int = 500 # Messages of a chat between re-sorting its filters by cost
+
+    # Background violation log writer
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_BATCH_SIZE: int = 500
+    LOG_FLUSH_INTERVAL: float = 1.0 # Seconds
+
+    # Punishment dispatcher (Telegram API rate limits)
+    PUNISH_WORKERS: int = 4
+    PUNISH_QUEUE_SIZE: int = 5000
+    PUNISH_GLOBAL_RATE: float = 25 # Calls per second for the whole bot
+    PUNISH_CHAT_RATE: float = 3 # Calls per second per chat
+    PUNISH_CHAT_BURST: int = 10
+    PUNISH_DEDUPE_WINDOW: float = 10 # Seconds, repeated mute/ban of a user is coalesced
+
+    # Recent message ids per user, purged on mute/ban
+    RECENT_MESSAGES_SIZE: int = 20
+    RECENT_MESSAGES_TTL: int = 600 # Seconds
+
+    # Album items (same media_group_id) are collected for this long and moderated together
+    ALBUM_BUFFER_DELAY: float = 1.0 # Seconds
+
+    # Repeats filter: near-duplicate (SimHash) index per chat, window = filter timer
+    REPEATS_WINDOW_SIZE: int = 200 # Recent messages remembered per chat
+    REPEATS_MAX_CHATS: int = 10000
+    REPEATS_MAX_DISTANCE: int = 10 # Differing bits out of 64 that still count as a copy
+    REPEATS_MIN_LENGTH: int = 16 # Shorter texts (after normalization) must match exactly, same user only
+    REPEATS_CROSS_USER_MIN: int = 3 # Users posting the same text that make it spam, 0 = off
+
+    # Flood filter: token buckets kept in process when running on MemoryCache
+    FLOOD_MAX_BUCKETS: int = 100000
+
+    # Admin supplied regexes: risky patterns run in worker processes
+    REGEX_TIMEOUT_MS: int = 50 # Time budget for all sandboxed regexes of one message
+    REGEX_WORKERS: int = 2
+    REGEX_MAX_TIMEOUTS: int = 3 # Timeouts within an hour that disable the filter
+    REGEX_SANDBOX_ALL: bool = False # Run every regex filter in the workers, not only risky ones
+
+    # Update ingestion
+    BOT_MODE: str = "polling" # polling, webhook
+    WEBHOOK_URL: str | None = None # Public base URL, without it the webhook is not registered (local testing)
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_SECRET: str | None = None
+    UPDATE_WORKERS: int = 16 # Chats are spread over workers, order is kept within a chat
+    UPDATE_QUEUE_SIZE: int = 10000
+
+    # Sharded mode: ingest pushes updates to Redis streams, workers consume them
+    # BOT_MODE=ingest (INGEST_SOURCE=polling|webhook), BOT_MODE=worker,
+    # or BOT_MODE=sharded to run both in one process (works with MemoryCache)
+    INGEST_SOURCE: str = "polling"
+    STREAM_SHARDS: int = 8 # Updates are partitioned by chat_id % STREAM_SHARDS
+    STREAM_PREFIX: str = "updates"
+    STREAM_GROUP: str = "guard_workers"
+    STREAM_MAXLEN: int = 100000
+    STREAM_BATCH: int = 100
+    STREAM_CLAIM_IDLE_MS: int = 60000 # Pending entries of dead workers are reclaimed after this
+    STREAM_LEASE_MS: int = 15000 # A shard is read by the holder of its lease only, renewed every third of this
+    WORKER_SHARDS: str = "" # Comma separated shards this worker may take, empty = any
+
+    METRICS_LOG_INTERVAL: int = 0 # Seconds between metrics dumps to the log, 0 = off
 
     LOG_LEVEL: str = "INFO"
 
@@ -1,3 +1,5 @@
+import logging
+from typing import Awaitable, Callable
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from bot.core.config import settings
@@ -16,3 +18,55 @@ async_session_factory = async_sessionmaker(
 async def get_session() -> AsyncSession:
     async with async_session_factory() as session:
         yield session
+
+class LazySession:
+    """
+    Unit of work for one update: the AsyncSession (and its pool connection)
+    is only created on first use, then shared by every middleware and handler
+    and committed once when the update is done.
+    """
+
+    def __init__(self):
+        self._session: AsyncSession | None = None
+        self._after_commit: list[Callable[[], Awaitable]] = []
+
+    async def get(self) -> AsyncSession:
+        if self._session is None:
+            self._session = async_session_factory()
+        return self._session
+
+    def after_commit(self, callback: Callable[[], Awaitable]):
+        """Runs callback once the unit of work is committed, never if it is rolled back."""
+        self._after_commit.append(callback)
+
+    async def commit(self):
+        if self._session is not None:
+            await self._session.commit()
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logging.error(f"After-commit callback failed: {e}")
+
+    async def rollback(self):
+        self._after_commit = []
+        if self._session is not None:
+            await self._session.rollback()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "LazySession":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                await self.commit()
+            else:
+                await self.rollback()
+        finally:
+            await self.close()
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+from aiogram.types import Update
+from aiogram.types.update import UpdateTypeLookupError
+from bot.core.metrics import metrics
+
+def partition_key(update: Update) -> int:
+    """Chat id of an update (user id when there is no chat), used to keep per-chat order."""
+    try:
+        event = update.event
+    except UpdateTypeLookupError:
+        # An update type this aiogram version does not model yet
+        return update.update_id
+    chat = getattr(event, "chat", None)
+    if chat is None and getattr(event, "message", None) is not None:
+        # Callback queries carry the chat in their message
+        chat = event.message.chat
+    if chat is not None:
+        return chat.id
+
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    return update.update_id
+
+class ChatOrderedExecutor:
+    """
+    Processes updates concurrently across chats while keeping them in order
+    within a chat: every chat is pinned to one of N worker queues.
+    """
+
+    def __init__(self, handle: Callable[..., Awaitable[Any]], workers: int = 16, max_queue: int = 10000):
+        self.handle = handle
+        self._queues = [asyncio.Queue(maxsize=max(1, max_queue // workers)) for _ in range(workers)]
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def stop(self, timeout: float = 10):
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Update queues not drained before shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, update: Update, *args: Any):
+        # Extra args are passed through to handle(update, *args)
+        queue = self._queues[partition_key(update) % len(self._queues)]
+        # Waits when the queue is full, which slows down the sender (backpressure)
+        await queue.put((update, args))
+        metrics.incr("updates.received")
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            update, args = await queue.get()
+            try:
+                await self.handle(update, *args)
+            except Exception as e:
+                metrics.incr("updates.failed")
+                logging.exception(f"Failed to process update {update.update_id}: {e}")
+            finally:
+                queue.task_done()
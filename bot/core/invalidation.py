@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import uuid
+from typing import Callable
+from bot.core.config import settings
+from bot.core.redis import redis_client
+from bot.core.memory_cache import MemoryCache
+
+class InvalidationBus:
+    """
+    Tells the other instances to drop their in-process copies of a key,
+    over Redis pub/sub. Handlers get the key, or None when everything must be
+    dropped (after a reconnect messages may have been lost).
+    Disabled with MemoryCache, a single process has nobody to notify.
+    """
+
+    def __init__(self, redis, channel: str):
+        self.redis = redis
+        self.channel = channel
+        self.enabled = not isinstance(redis, MemoryCache)
+        self.instance_id = uuid.uuid4().hex
+        self._handlers: dict[str, Callable[[str | None], None]] = {}
+        self._task: asyncio.Task | None = None
+        self._pending: set[asyncio.Task] = set()
+
+    def subscribe(self, topic: str, handler: Callable[[str | None], None]):
+        self._handlers[topic] = handler
+
+    def encode(self, topic: str, key: str) -> str:
+        return f"{self.instance_id}|{topic}|{key}"
+
+    async def publish(self, topic: str, key: str):
+        if not self.enabled:
+            return
+        try:
+            await self.redis.publish(self.channel, self.encode(topic, key))
+        except Exception as e:
+            logging.warning(f"Failed to publish invalidation of {topic}:{key}: {e}")
+
+    def publish_soon(self, topic: str, key: str):
+        """publish() for synchronous callers, runs in the background."""
+        if not self.enabled:
+            return
+        task = asyncio.get_running_loop().create_task(self.publish(topic, key))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen(self):
+        first = True
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                if not first:
+                    self._dispatch_all()
+                first = False
+
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Invalidation listener failed: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
+
+    def _dispatch(self, data: str):
+        sender, _, rest = data.partition("|")
+        topic, _, key = rest.partition("|")
+        if sender == self.instance_id:
+            return
+        handler = self._handlers.get(topic)
+        if handler is not None:
+            handler(key)
+
+    def _dispatch_all(self):
+        for handler in self._handlers.values():
+            handler(None)
+
+bus = InvalidationBus(redis_client, settings.INVALIDATION_CHANNEL)
@@ -0,0 +1,54 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+_MISSING = object()
+
+class LRUCache:
+    """
+    Small in-process LRU cache with an optional per-entry TTL.
+    Not thread-safe; meant to be used from the event loop only.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            return default
+
+        value, expire_at = item
+        if expire_at is not None and time.monotonic() > expire_at:
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        ttl = self.ttl if ttl is None else ttl
+        expire_at = (time.monotonic() + ttl) if ttl else None
+        self._data[key] = (value, expire_at)
+        self._data.move_to_end(key)
+
+        # Evict least recently used entries
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, _MISSING)
+        if item is _MISSING:
+            return default
+        return item[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,28 +1,581 @@
 import time
 import asyncio
+import heapq
+import sys
+from collections import OrderedDict, deque
+from fnmatch import fnmatchcase
 
 class MemoryCache:
-    def __init__(self):
-        self.store = {}
+    """
+    In-process stand-in for redis.asyncio.Redis (decode_responses=True) used
+    when no Redis is configured. Bounded by entry count and approximate size
+    (least recently used keys are evicted first); expired keys are removed by
+    a background sweeper driven by an expiry heap, not only when read.
+    Streams have their own byte budget: past it the oldest entries of the
+    stream being written are trimmed, as by MAXLEN, and keys are never
+    evicted to make room for them.
+    Implements the subset of the Redis API the bot uses.
+    """
+
+    def __init__(self, max_entries: int = 100000, max_bytes: int = 64 * 1024 * 1024, max_stream_bytes: int = 64 * 1024 * 1024, sweep_interval: float = 1.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_stream_bytes = max_stream_bytes
+        self.sweep_interval = sweep_interval
+
+        self.store: OrderedDict = OrderedDict()
+        self.sizes: dict[str, int] = {}
+        self.used_bytes = 0
+        self.expires: dict[str, float] = {}
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._sweeper: asyncio.Task | None = None
+
+        # Streams: key -> deque of (id, fields); groups: (key, group) -> state
+        self.streams: dict[str, deque] = {}
+        self.stream_seq: dict[str, tuple[int, int]] = {}
+        self.stream_events: dict[str, asyncio.Event] = {}
+        self.groups: dict[tuple[str, str], dict] = {}
+        self.stream_bytes = 0
+
+    # Internals
+
+    @staticmethod
+    def _encode(value) -> str:
+        # Redis stores strings, numbers come back as their text form
+        if isinstance(value, bytes):
+            return value.decode()
+        return value if isinstance(value, str) else str(value)
+
+    @staticmethod
+    def _sizeof(key: str, value) -> int:
+        size = sys.getsizeof(key) + sys.getsizeof(value)
+        if isinstance(value, dict):
+            size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+        elif isinstance(value, (set, deque, list)):
+            size += sum(sys.getsizeof(v) for v in value)
+        return size
+
+    def _is_expired(self, key: str, now: float | None = None) -> bool:
+        expire_at = self.expires.get(key)
+        return expire_at is not None and (now or time.monotonic()) >= expire_at
+
+    def _lookup(self, key: str, default=None):
+        if key not in self.store:
+            return default
+        if self._is_expired(key):
+            self._remove(key)
+            return default
+        self.store.move_to_end(key)
+        return self.store[key]
+
+    def _write(self, key: str, value, keep_ttl: bool = False):
+        if key in self.store:
+            self.used_bytes -= self.sizes.get(key, 0)
+        self.store[key] = value
+        self.store.move_to_end(key)
+        size = self._sizeof(key, value)
+        self.sizes[key] = size
+        self.used_bytes += size
+        if not keep_ttl:
+            self.expires.pop(key, None)
+
+        self._ensure_sweeper()
+        self._evict()
+
+    def _touch(self, key: str):
+        # Recompute the size of a container that was modified in place
+        value = self.store.get(key)
+        if value is None:
+            return
+        if (isinstance(value, (dict, set, deque, list))) and not value:
+            self._remove(key)
+            return
+        self._write(key, value, keep_ttl=True)
+
+    def _remove(self, key: str) -> bool:
+        if key not in self.store:
+            return False
+        del self.store[key]
+        self.used_bytes -= self.sizes.pop(key, 0)
+        self.expires.pop(key, None)
+        return True
+
+    def _set_expiry(self, key: str, seconds: float):
+        expire_at = time.monotonic() + seconds
+        self.expires[key] = expire_at
+        heapq.heappush(self._expiry_heap, (expire_at, key))
+        # Superseded entries (TTL rewritten, key deleted or persisted) stay in
+        # the heap until their time; rebuild it before they outnumber the keys
+        if len(self._expiry_heap) > 2 * len(self.expires) + 64:
+            self._expiry_heap = [(expire_at, key) for key, expire_at in self.expires.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def _evict(self):
+        while self.store and (len(self.store) > self.max_entries or self.used_bytes > self.max_bytes):
+            key, _ = self.store.popitem(last=False)
+            self.used_bytes -= self.sizes.pop(key, 0)
+            self.expires.pop(key, None)
+
+    def sweep(self) -> int:
+        """Removes every expired key, returns how many were removed."""
+        now = time.monotonic()
+        removed = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expire_at, key = heapq.heappop(heap)
+            # Stale heap entries (TTL changed or key deleted) are skipped
+            if self.expires.get(key) == expire_at and self._remove(key):
+                removed += 1
+        return removed
+
+    def _ensure_sweeper(self):
+        if self._sweeper is not None and not self._sweeper.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._sweeper = loop.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+    # Keys
+
+    async def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._remove(key))
+
+    async def exists(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._lookup(key) is not None)
+
+    async def expire(self, key: str, time_seconds: int) -> bool:
+        if self._lookup(key) is None:
+            return False
+        self._set_expiry(key, time_seconds)
+        return True
+
+    async def pexpire(self, key: str, time_ms: int) -> bool:
+        return await self.expire(key, time_ms / 1000)
+
+    async def persist(self, key: str) -> bool:
+        return self.expires.pop(key, None) is not None
+
+    async def ttl(self, key: str) -> int:
+        if self._lookup(key) is None:
+            return -2
+        expire_at = self.expires.get(key)
+        if expire_at is None:
+            return -1
+        return max(0, round(expire_at - time.monotonic()))
+
+    async def keys(self, pattern: str = "*") -> list[str]:
+        now = time.monotonic()
+        return [key for key in list(self.store) if not self._is_expired(key, now) and fnmatchcase(key, pattern)]
+
+    async def flushdb(self):
+        self.store.clear()
+        self.sizes.clear()
+        self.expires.clear()
+        self._expiry_heap.clear()
+        self.used_bytes = 0
+        self.streams.clear()
+        self.stream_seq.clear()
+        self.groups.clear()
+        self.stream_bytes = 0
+
+    async def ping(self) -> bool:
+        return True
+
+    # Strings
 
     async def get(self, key: str):
-        data = self.store.get(key)
-        if not data:
-            return None
-        
-        val, expire_at = data
-        if expire_at and time.time() > expire_at:
-            del self.store[key]
+        value = self._lookup(key)
+        return value if isinstance(value, str) else None
+
+    async def mget(self, keys, *args) -> list:
+        if isinstance(keys, str):
+            keys = [keys, *args]
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value, ex: int = None, px: int = None, nx: bool = False, xx: bool = False, keepttl: bool = False):
+        exists = self._lookup(key) is not None
+        if (nx and exists) or (xx and not exists):
             return None
-        return val
+        self._write(key, self._encode(value), keep_ttl=keepttl)
+        if ex:
+            self._set_expiry(key, ex)
+        elif px:
+            self._set_expiry(key, px / 1000)
+        return True
+
+    async def setex(self, key: str, time_seconds: int, value):
+        return await self.set(key, value, ex=time_seconds)
+
+    async def mset(self, mapping: dict) -> bool:
+        for key, value in mapping.items():
+            self._write(key, self._encode(value))
+        return True
+
+    async def incrby(self, key: str, amount: int = 1) -> int:
+        value = int(self._lookup(key) or 0) + amount
+        self._write(key, str(value), keep_ttl=True)
+        return value
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        return await self.incrby(key, amount)
+
+    async def decr(self, key: str, amount: int = 1) -> int:
+        return await self.incrby(key, -amount)
+
+    # Hashes
+
+    async def hset(self, name: str, key: str = None, value=None, mapping: dict = None) -> int:
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        data = self._lookup(name)
+        if data is None:
+            data = {}
+            self._write(name, data)
+        added = sum(1 for k in items if k not in data)
+        data.update({k: self._encode(v) for k, v in items.items()})
+        self._touch(name)
+        return added
+
+    async def hget(self, name: str, key: str):
+        return (self._lookup(name) or {}).get(key)
+
+    async def hgetall(self, name: str) -> dict:
+        return dict(self._lookup(name) or {})
+
+    async def hdel(self, name: str, *keys: str) -> int:
+        data = self._lookup(name) or {}
+        removed = sum(1 for k in keys if data.pop(k, None) is not None)
+        self._touch(name)
+        return removed
+
+    async def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        data = self._lookup(name)
+        if data is None:
+            data = {}
+            self._write(name, data)
+        value = int(data.get(key, 0)) + amount
+        data[key] = str(value)
+        self._touch(name)
+        return value
+
+    # Sets
+
+    async def sadd(self, name: str, *values) -> int:
+        data = self._lookup(name)
+        if data is None:
+            data = set()
+            self._write(name, data)
+        before = len(data)
+        data.update(self._encode(v) for v in values)
+        self._touch(name)
+        return len(data) - before
 
-    async def setex(self, key: str, time_seconds: int, value: str):
-        expire_at = time.time() + time_seconds
-        self.store[key] = (value, expire_at)
+    async def srem(self, name: str, *values) -> int:
+        data = self._lookup(name) or set()
+        removed = 0
+        for v in values:
+            if self._encode(v) in data:
+                data.discard(self._encode(v))
+                removed += 1
+        self._touch(name)
+        return removed
 
-    async def set(self, key: str, value: str, ex: int = None):
-        expire_at = (time.time() + ex) if ex else None
-        self.store[key] = (value, expire_at)
+    async def smembers(self, name: str) -> set:
+        return set(self._lookup(name) or ())
+
+    async def sismember(self, name: str, value) -> bool:
+        return self._encode(value) in (self._lookup(name) or ())
+
+    async def scard(self, name: str) -> int:
+        return len(self._lookup(name) or ())
+
+    # Sorted sets (member -> score, ordered by score on read)
+
+    @staticmethod
+    def _score_bound(bound) -> tuple[float, bool]:
+        # Returns (value, exclusive) for "-inf", "+inf", "(5", 5
+        if isinstance(bound, str):
+            if bound in ("-inf", "+inf", "inf"):
+                return float(bound), False
+            if bound.startswith("("):
+                return float(bound[1:]), True
+            return float(bound), False
+        return float(bound), False
+
+    def _zrange_items(self, name: str, min_score, max_score) -> list[tuple[str, float]]:
+        low, low_ex = self._score_bound(min_score)
+        high, high_ex = self._score_bound(max_score)
+        items = sorted((self._lookup(name) or {}).items(), key=lambda item: (item[1], item[0]))
+        return [
+            (member, score) for member, score in items
+            if (score > low if low_ex else score >= low) and (score < high if high_ex else score <= high)
+        ]
+
+    async def zadd(self, name: str, mapping: dict, nx: bool = False, xx: bool = False) -> int:
+        data = self._lookup(name)
+        if data is None:
+            data = {}
+            self._write(name, data)
+        added = 0
+        for member, score in mapping.items():
+            member = self._encode(member)
+            if (nx and member in data) or (xx and member not in data):
+                continue
+            if member not in data:
+                added += 1
+            data[member] = float(score)
+        self._touch(name)
+        return added
+
+    async def zrem(self, name: str, *members) -> int:
+        data = self._lookup(name) or {}
+        removed = sum(1 for m in members if data.pop(self._encode(m), None) is not None)
+        self._touch(name)
+        return removed
+
+    async def zcard(self, name: str) -> int:
+        return len(self._lookup(name) or {})
+
+    async def zscore(self, name: str, member):
+        return (self._lookup(name) or {}).get(self._encode(member))
+
+    async def zcount(self, name: str, min_score, max_score) -> int:
+        return len(self._zrange_items(name, min_score, max_score))
+
+    async def zrangebyscore(self, name: str, min_score, max_score, start: int = None, num: int = None, withscores: bool = False) -> list:
+        items = self._zrange_items(name, min_score, max_score)
+        if start is not None and num is not None:
+            items = items[start:start + num]
+        return items if withscores else [member for member, _ in items]
+
+    async def zrange(self, name: str, start: int, end: int, withscores: bool = False) -> list:
+        items = sorted((self._lookup(name) or {}).items(), key=lambda item: (item[1], item[0]))
+        items = items[start:(end + 1) or None]
+        return items if withscores else [member for member, _ in items]
+
+    async def zremrangebyscore(self, name: str, min_score, max_score) -> int:
+        data = self._lookup(name) or {}
+        removed = 0
+        for member, _ in self._zrange_items(name, min_score, max_score):
+            del data[member]
+            removed += 1
+        self._touch(name)
+        return removed
+
+    # Lists
+
+    async def lpush(self, name: str, *values) -> int:
+        data = self._lookup(name)
+        if data is None:
+            data = deque()
+            self._write(name, data)
+        for v in values:
+            data.appendleft(self._encode(v))
+        self._touch(name)
+        return len(data)
+
+    async def rpush(self, name: str, *values) -> int:
+        data = self._lookup(name)
+        if data is None:
+            data = deque()
+            self._write(name, data)
+        data.extend(self._encode(v) for v in values)
+        self._touch(name)
+        return len(data)
+
+    async def lrange(self, name: str, start: int, end: int) -> list:
+        data = list(self._lookup(name) or ())
+        return data[start:(end + 1) or None]
+
+    async def ltrim(self, name: str, start: int, end: int) -> bool:
+        data = self._lookup(name)
+        if data is None:
+            return True
+        kept = list(data)[start:(end + 1) or None]
+        data.clear()
+        data.extend(kept)
+        self._touch(name)
+        return True
+
+    async def llen(self, name: str) -> int:
+        return len(self._lookup(name) or ())
+
+    # Pub/Sub: a single process has nobody to notify
+
+    async def publish(self, channel: str, message) -> int:
+        return 0
+
+    # Pipelines
+
+    def pipeline(self, transaction: bool = True) -> "MemoryPipeline":
+        return MemoryPipeline(self)
+
+    # Streams (subset of XADD/XGROUP/XREADGROUP/XACK/XAUTOCLAIM used for update sharding)
+
+    def _next_stream_id(self, key: str) -> str:
+        ms = int(time.time() * 1000)
+        last_ms, last_seq = self.stream_seq.get(key, (0, -1))
+        seq = last_seq + 1 if ms <= last_ms else 0
+        ms = max(ms, last_ms)
+        self.stream_seq[key] = (ms, seq)
+        return f"{ms}-{seq}"
+
+    @staticmethod
+    def _id_tuple(entry_id: str) -> tuple[int, int]:
+        ms, _, seq = entry_id.partition("-")
+        return int(ms), int(seq or 0)
+
+    async def xadd(self, name: str, fields: dict, maxlen: int = None, approximate: bool = True):
+        stream = self.streams.setdefault(name, deque())
+        entry_id = self._next_stream_id(name)
+        fields = dict(fields)
+        stream.append((entry_id, fields))
+        self.stream_bytes += self._sizeof(entry_id, fields)
+        # The newest entry is always kept
+        while len(stream) > 1 and ((maxlen and len(stream) > maxlen) or self.stream_bytes > self.max_stream_bytes):
+            self.stream_bytes -= self._sizeof(*stream.popleft())
+        self.stream_events.setdefault(name, asyncio.Event()).set()
+        return entry_id
+
+    async def xgroup_create(self, name: str, groupname: str, id: str = "$", mkstream: bool = False):
+        if name not in self.streams:
+            if not mkstream:
+                raise ValueError("ERR no such key")
+            self.streams[name] = deque()
+        if (name, groupname) in self.groups:
+            raise ValueError("BUSYGROUP Consumer Group name already exists")
+
+        stream = self.streams[name]
+        last = stream[-1][0] if id == "$" and stream else ("0-0" if id in ("$", "0") else id)
+        self.groups[(name, groupname)] = {"last": last, "pending": {}}
+        return True
+
+    async def xreadgroup(self, groupname: str, consumername: str, streams: dict, count: int = None, block: int = None, noack: bool = False):
+        # Like Redis: no block returns at once, block=0 waits for as long as it
+        # takes, and reading a consumer's pending history never blocks
+        if any(start != ">" for start in streams.values()):
+            block = None
+        deadline = time.monotonic() + block / 1000 if block else None
+        while True:
+            result = []
+            for name, start in streams.items():
+                group = self.groups.get((name, groupname))
+                if group is None:
+                    raise ValueError("NOGROUP No such key or consumer group")
+                entries = self._read_group(name, group, consumername, start, count, noack)
+                if entries:
+                    result.append([name, entries])
+
+            if result or block is None:
+                return result
+            timeout = deadline - time.monotonic() if deadline is not None else None
+            if timeout is not None and timeout <= 0:
+                return []
+
+            # Wait for any of the streams to receive an entry
+            waiters = []
+            for name in streams:
+                event = self.stream_events.setdefault(name, asyncio.Event())
+                event.clear()
+                waiters.append(asyncio.ensure_future(event.wait()))
+            done, pending = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for waiter in pending:
+                waiter.cancel()
+
+    def _read_group(self, name: str, group: dict, consumer: str, start: str, count: int, noack: bool) -> list:
+        stream = self.streams.get(name, ())
+        entries = []
+        if start == ">":
+            last = self._id_tuple(group["last"])
+            for entry_id, fields in stream:
+                if self._id_tuple(entry_id) > last:
+                    entries.append((entry_id, fields))
+                    if count and len(entries) >= count:
+                        break
+            if entries:
+                group["last"] = entries[-1][0]
+                if not noack:
+                    now = time.monotonic()
+                    for entry_id, _ in entries:
+                        group["pending"][entry_id] = (consumer, now)
+        else:
+            # History of this consumer's pending entries
+            since = self._id_tuple(start)
+            mine = {i for i, (c, _) in group["pending"].items() if c == consumer}
+            for entry_id, fields in stream:
+                if entry_id in mine and self._id_tuple(entry_id) > since:
+                    entries.append((entry_id, fields))
+                    if count and len(entries) >= count:
+                        break
+        return entries
+
+    async def xack(self, name: str, groupname: str, *ids: str) -> int:
+        group = self.groups.get((name, groupname))
+        if group is None:
+            return 0
+        return sum(1 for entry_id in ids if group["pending"].pop(entry_id, None) is not None)
+
+    async def xautoclaim(self, name: str, groupname: str, consumername: str, min_idle_time: int, start_id: str = "0-0", count: int = None):
+        group = self.groups.get((name, groupname))
+        if group is None:
+            raise ValueError("NOGROUP No such key or consumer group")
+
+        now = time.monotonic()
+        stream = {entry_id: fields for entry_id, fields in self.streams.get(name, ())}
+        since = self._id_tuple(start_id)
+        claimed = []
+        for entry_id, (_, delivered_at) in sorted(group["pending"].items(), key=lambda item: self._id_tuple(item[0])):
+            if self._id_tuple(entry_id) < since or (now - delivered_at) * 1000 < min_idle_time:
+                continue
+            if entry_id not in stream:
+                # Trimmed away, nothing left to deliver
+                del group["pending"][entry_id]
+                continue
+            group["pending"][entry_id] = (consumername, now)
+            claimed.append((entry_id, stream[entry_id]))
+            if count and len(claimed) >= count:
+                break
+        return ["0-0", claimed, []]
 
     async def close(self):
-        self.store.clear()
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        await self.flushdb()
+
+class MemoryPipeline:
+    """Buffers commands like redis-py's pipeline and runs them on execute()."""
+
+    def __init__(self, cache: MemoryCache):
+        self.cache = cache
+        self.commands: list[tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        if name.startswith("_") or not hasattr(self.cache, name):
+            raise AttributeError(name)
+
+        def queue(*args, **kwargs) -> "MemoryPipeline":
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> list:
+        commands, self.commands = self.commands, []
+        return [await getattr(self.cache, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+    def reset(self):
+        self.commands = []
+
+    async def __aenter__(self) -> "MemoryPipeline":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.reset()
@@ -0,0 +1,33 @@
+import asyncio
+import logging
+from collections import defaultdict
+
+class Metrics:
+    """
+    Process-local counters and gauges.
+    Cheap enough to update on the per-message path.
+    """
+
+    def __init__(self):
+        self.counters: dict[str, int] = defaultdict(int)
+        self.gauges: dict[str, float] = {}
+
+    def incr(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def snapshot(self) -> dict[str, float]:
+        data = dict(self.counters)
+        data.update(self.gauges)
+        return data
+
+metrics = Metrics()
+
+async def log_metrics(interval: float):
+    """Periodically writes all counters and gauges to the log."""
+    while True:
+        await asyncio.sleep(interval)
+        data = metrics.snapshot()
+        logging.info("Metrics: " + ", ".join(f"{name}={data[name]}" for name in sorted(data)))
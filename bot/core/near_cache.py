@@ -0,0 +1,86 @@
+from bot.core.config import settings
+from bot.core.redis import redis_client
+from bot.core.lru import LRUCache
+from bot.core.metrics import metrics
+from bot.core.invalidation import InvalidationBus, bus
+
+_MISSING = object()
+
+class NearCache:
+    """
+    Read-through, write-through in-process cache in front of Redis for hot
+    keys that are read on every message. Local copies live a few seconds
+    (absent keys a bit less) and are dropped on other instances when a key
+    is written or deleted.
+    """
+
+    TOPIC = "near"
+
+    def __init__(self, redis, bus: InvalidationBus, maxsize: int = 100000, ttl: float = 10, negative_ttl: float = 2):
+        self.redis = redis
+        self.bus = bus
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._local = LRUCache(maxsize=maxsize)
+        # Bumped on every local write so a slow read does not cache a stale value
+        self._version = 0
+        bus.subscribe(self.TOPIC, self._on_invalidate)
+
+    async def get(self, key: str) -> str | None:
+        value = self._local.get(key, _MISSING)
+        if value is not _MISSING:
+            metrics.incr("near_cache.hit" if value is not None else "near_cache.negative_hit")
+            return value
+
+        metrics.incr("near_cache.miss")
+        version = self._version
+        value = await self.redis.get(key)
+        if self._version == version:
+            self._remember(key, value)
+        return value
+
+    def _remember(self, key: str, value: str | None):
+        self._local.set(key, value, ttl=self.ttl if value is not None else self.negative_ttl)
+        metrics.gauge("near_cache.size", len(self._local))
+
+    async def set(self, key: str, value, ex: int | None = None, broadcast: bool = True):
+        """
+        broadcast=False skips invalidating other instances, for keys only
+        this instance writes (per-chat state, chats are partitioned).
+        """
+        await self.redis.set(key, value, ex=ex)
+        self._set_local(key, value, ex)
+        if broadcast:
+            await self.bus.publish(self.TOPIC, key)
+
+    def _set_local(self, key: str, value, ex: int | None):
+        self._version += 1
+        # Never keep a local copy longer than Redis keeps the key
+        self._local.set(key, str(value), ttl=min(self.ttl, ex) if ex else self.ttl)
+
+    async def setex(self, key: str, time_seconds: int, value, broadcast: bool = True):
+        await self.set(key, value, ex=time_seconds, broadcast=broadcast)
+
+    async def delete(self, key: str):
+        await self.redis.delete(key)
+        self.invalidate(key)
+        await self.bus.publish(self.TOPIC, key)
+
+    def invalidate(self, key: str):
+        self._version += 1
+        self._local.pop(key)
+
+    def _on_invalidate(self, key: str | None):
+        if key is None:
+            self._version += 1
+            self._local.clear()
+        else:
+            self.invalidate(key)
+
+near_cache = NearCache(
+    redis_client,
+    bus,
+    maxsize=settings.NEAR_CACHE_SIZE,
+    ttl=settings.NEAR_CACHE_TTL,
+    negative_ttl=settings.NEAR_CACHE_NEGATIVE_TTL,
+)
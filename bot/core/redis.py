@@ -9,7 +9,11 @@ if settings.redis_url:
         decode_responses=True
     )
 else:
-    redis_client = MemoryCache()
+    redis_client = MemoryCache(
+        max_entries=settings.MEMORY_CACHE_MAX_ENTRIES,
+        max_bytes=settings.MEMORY_CACHE_MAX_BYTES,
+        max_stream_bytes=settings.MEMORY_CACHE_MAX_STREAM_BYTES,
+    )
 
 async def get_redis():
     return redis_client
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import multiprocessing
+import re
+from multiprocessing.connection import Connection
+
+def _serve(conn: Connection):
+    # Worker process: compiled patterns are kept between requests
+    compiled: dict[str, re.Pattern | None] = {}
+    while True:
+        try:
+            pattern, text = conn.recv()
+        except (EOFError, OSError):
+            return
+        if pattern not in compiled:
+            if len(compiled) > 1000:
+                compiled.clear()
+            try:
+                compiled[pattern] = re.compile(pattern, re.IGNORECASE)
+            except re.error:
+                compiled[pattern] = None
+        regex = compiled[pattern]
+        conn.send(regex is not None and regex.search(text) is not None)
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+class RegexSandbox:
+    """
+    Runs untrusted regexes in worker processes. The re module holds the GIL
+    while matching, so a thread would not help: a search that overruns its
+    timeout gets its process killed and replaced, the event loop never waits.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self._context = multiprocessing.get_context("forkserver")
+        # Workers only need this module, not the bot
+        self._context.set_forkserver_preload([__name__])
+        self._idle: asyncio.Queue | None = None
+        self._all: list[_Worker] = []
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context)
+        self._all.append(worker)
+        return worker
+
+    def start(self):
+        # Workers take a moment to boot, better before the first message
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+            for _ in range(self.workers):
+                self._idle.put_nowait(self._spawn())
+
+    async def search(self, pattern: str, text: str, timeout: float) -> tuple[bool, float]:
+        """
+        Returns whether the pattern matched and the seconds the worker spent on it.
+        Waiting for a free worker is not timed. Raises asyncio.TimeoutError if the
+        worker ran longer than timeout seconds and had to be killed.
+        """
+        self.start()
+        worker = await self._idle.get()
+        loop = asyncio.get_running_loop()
+        busy = False
+        try:
+            started = loop.time()
+            worker.conn.send((pattern, text))
+            busy = True
+            await asyncio.wait_for(self._readable(worker.conn), timeout)
+            result = worker.conn.recv()
+            busy = False
+            return result, loop.time() - started
+        except asyncio.TimeoutError:
+            # A subclass of OSError since Python 3.11, not a dead worker
+            raise
+        except (EOFError, OSError) as e:
+            logging.error(f"Regex worker died: {e}")
+            busy = True
+            return False, 0.0
+        finally:
+            # Timed out (cancelled) or crashed: the process cannot be reused
+            if busy:
+                worker.kill()
+                self._all.remove(worker)
+                worker = self._spawn()
+            self._idle.put_nowait(worker)
+
+    @staticmethod
+    async def _readable(conn: Connection):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        fd = conn.fileno()
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_reader(fd)
+
+    def stop(self):
+        for worker in self._all:
+            worker.kill()
+        self._all = []
+        self._idle = None
@@ -0,0 +1,35 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+from bot.core.metrics import metrics
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts
+    the coroutine, callers arriving while it runs await the same result
+    (or exception). Runs as a task, so a cancelled caller does not cancel
+    it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is not None:
+            metrics.incr(f"{self.name}.coalesced")
+        else:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._calls)
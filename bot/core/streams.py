@@ -0,0 +1,273 @@
+import asyncio
+import logging
+import os
+import socket
+from contextvars import ContextVar
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from bot.core.config import settings
+from bot.core.executor import ChatOrderedExecutor, partition_key
+from bot.core.metrics import metrics
+
+def stream_key(shard: int) -> str:
+    return f"{settings.STREAM_PREFIX}:{shard}"
+
+def shard_for(key: int) -> int:
+    return key % settings.STREAM_SHARDS
+
+def lease_key(shard: int) -> str:
+    return f"{settings.STREAM_PREFIX}:lease:{shard}"
+
+def worker_shards() -> list[int]:
+    # "0,2" -> [0, 2], empty means every shard (leases decide who consumes it)
+    if settings.WORKER_SHARDS:
+        return [int(x) for x in settings.WORKER_SHARDS.split(",") if x.strip()]
+    return list(range(settings.STREAM_SHARDS))
+
+class Acknowledgement:
+    """Acknowledges one stream entry; a handler may take it over with defer_ack()."""
+
+    __slots__ = ("redis", "key", "group", "entry_id", "deferred")
+
+    def __init__(self, redis, key: str, group: str, entry_id: str):
+        self.redis = redis
+        self.key = key
+        self.group = group
+        self.entry_id = entry_id
+        self.deferred = False
+
+    async def __call__(self):
+        await self.redis.xack(self.key, self.group, self.entry_id)
+        metrics.incr("streams.consumed")
+
+# Entry being processed in the current task, None outside of stream workers
+_current_ack: ContextVar[Acknowledgement | None] = ContextVar("current_ack", default=None)
+
+def defer_ack() -> Acknowledgement | None:
+    """
+    For handlers that finish an update later (buffered albums): the entry is
+    not acknowledged when the handler returns, the caller acknowledges it once
+    done. Until then a crash leaves it pending and it is redelivered.
+    """
+    ack = _current_ack.get()
+    if ack is not None:
+        ack.deferred = True
+    return ack
+
+class UpdateProducer:
+    """
+    Ingest side: appends raw updates to Redis streams partitioned by chat id,
+    so all updates of a chat land in the same shard, in order.
+    Has the same submit() interface as ChatOrderedExecutor.
+    """
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def submit(self, update: Update):
+        shard = shard_for(partition_key(update))
+        payload = update.model_dump_json(exclude_unset=True, by_alias=True)
+        await self.redis.xadd(
+            stream_key(shard),
+            {"update": payload},
+            maxlen=settings.STREAM_MAXLEN,
+            approximate=True,
+        )
+        metrics.incr("streams.produced")
+
+class UpdateConsumer:
+    """
+    Worker side: reads its shards through a consumer group and feeds updates
+    to the dispatcher. Entries are acknowledged after processing
+    (at-least-once); entries left pending by a dead worker are reclaimed.
+    A shard is only read while holding its lease, so all updates of a chat
+    are handled by one process even if workers are given overlapping shards.
+    """
+
+    def __init__(self, redis, bot: Bot, dp: Dispatcher, shards: list[int], name: str | None = None):
+        self.redis = redis
+        self.bot = bot
+        self.dp = dp
+        self.shards = shards
+        self.group = settings.STREAM_GROUP
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.executor = ChatOrderedExecutor(
+            self._process,
+            workers=settings.UPDATE_WORKERS,
+            max_queue=settings.UPDATE_QUEUE_SIZE,
+        )
+        # Entries handed to the executor and not processed yet: still pending
+        # in the group, but neither stale nor to be read again
+        self._in_flight: set[tuple[str, str]] = set()
+
+    async def run(self):
+        for shard in self.shards:
+            try:
+                await self.redis.xgroup_create(stream_key(shard), self.group, id="0", mkstream=True)
+            except Exception as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+        self.executor.start()
+        tasks = [asyncio.create_task(self._hold(shard)) for shard in self.shards]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.executor.stop()
+
+    async def _hold(self, shard: int):
+        # Consume the shard while its lease is ours, otherwise stand by for it
+        ttl = settings.STREAM_LEASE_MS
+        key = lease_key(shard)
+        while True:
+            try:
+                acquired = await self.redis.set(key, self.name, px=ttl, nx=True)
+            except Exception as e:
+                logging.error(f"Failed to take the lease of shard {shard}: {e}")
+                acquired = False
+            if not acquired:
+                await asyncio.sleep(ttl / 3000)
+                continue
+
+            logging.info(f"Consuming shard {shard}")
+            consumer = asyncio.create_task(self._consume(shard))
+            try:
+                await self._keep_lease(key, ttl, consumer)
+                logging.warning(f"Lost the lease of shard {shard}")
+            finally:
+                consumer.cancel()
+                await self._release(key)
+
+    async def _keep_lease(self, key: str, ttl: int, consumer: asyncio.Task):
+        # Returns once the lease is gone, or could not be renewed before it expired
+        loop = asyncio.get_running_loop()
+        renewed = loop.time()
+        while not consumer.done():
+            await asyncio.sleep(ttl / 3000)
+            try:
+                # Another owner taking over in between is harmless, we see it next time
+                if await self.redis.get(key) != self.name:
+                    return
+                await self.redis.pexpire(key, ttl)
+                renewed = loop.time()
+            except Exception as e:
+                logging.error(f"Failed to renew {key}: {e}")
+                # Give up before it can expire and be taken by someone else
+                if loop.time() - renewed > ttl / 1500:
+                    return
+
+    async def _release(self, key: str):
+        try:
+            if await self.redis.get(key) == self.name:
+                await self.redis.delete(key)
+        except Exception as e:
+            logging.error(f"Failed to release {key}: {e}")
+
+    async def _consume(self, shard: int):
+        key = stream_key(shard)
+
+        # First redeliver what this consumer had not acknowledged before a restart
+        start = "0"
+        last_claim = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if loop.time() - last_claim > settings.STREAM_CLAIM_IDLE_MS / 1000:
+                    last_claim = loop.time()
+                    await self._claim_stale(key)
+
+                response = await self.redis.xreadgroup(
+                    self.group, self.name, {key: start}, count=settings.STREAM_BATCH, block=1000
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Failed to read {key}: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            entries = response[0][1] if response else []
+            if start == "0" and not entries:
+                start = ">"
+                continue
+
+            for entry_id, fields in entries:
+                await self._submit(key, entry_id, fields)
+            if start == "0" and entries:
+                start = entries[-1][0]
+
+    async def _claim_stale(self, key: str):
+        # Entries delivered to a consumer that died and never acknowledged them,
+        # or left pending here by a failed update; ours still queued are skipped
+        result = await self.redis.xautoclaim(
+            key, self.group, self.name, settings.STREAM_CLAIM_IDLE_MS, "0-0", count=settings.STREAM_BATCH
+        )
+        for entry_id, fields in result[1]:
+            metrics.incr("streams.reclaimed")
+            await self._submit(key, entry_id, fields)
+
+    async def _submit(self, key: str, entry_id: str, fields: dict):
+        if (key, entry_id) in self._in_flight:
+            metrics.incr("streams.in_flight_skipped")
+            return
+        try:
+            update = Update.model_validate_json(fields["update"], context={"bot": self.bot})
+        except Exception as e:
+            # Poison entry, acknowledge so it is not redelivered forever
+            logging.error(f"Dropping malformed update {entry_id} from {key}: {e}")
+            await self.redis.xack(key, self.group, entry_id)
+            return
+        # The entry is acknowledged once processed
+        self._in_flight.add((key, entry_id))
+        try:
+            await self.executor.submit(update, key, entry_id)
+        except BaseException:
+            self._in_flight.discard((key, entry_id))
+            raise
+
+    async def _process(self, update: Update, key: str, entry_id: str):
+        ack = Acknowledgement(self.redis, key, self.group, entry_id)
+        token = _current_ack.set(ack)
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            # Left pending, redelivered by XAUTOCLAIM after STREAM_CLAIM_IDLE_MS
+            logging.error(f"Failed to process update {entry_id} from {key}: {e}")
+            metrics.incr("streams.failed")
+            return
+        finally:
+            _current_ack.reset(token)
+            # A failed or deferred entry that stays pending may be reclaimed later
+            self._in_flight.discard((key, entry_id))
+        if not ack.deferred:
+            await ack()
+
+async def run_polling_ingest(bot: Bot, dp: Dispatcher, producer: UpdateProducer):
+    """Long-polls Telegram and pushes updates to the streams without handling them."""
+    await bot.delete_webhook()
+    allowed_updates = dp.resolve_used_update_types()
+    offset = None
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Failed to fetch updates: {e}")
+            await asyncio.sleep(1)
+            continue
+
+        for update in updates:
+            # Retried until it is in the stream, updates are not skipped
+            while True:
+                try:
+                    await producer.submit(update)
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.error(f"Failed to push update {update.update_id}: {e}")
+                    await asyncio.sleep(1)
+            offset = update.update_id + 1
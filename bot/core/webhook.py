@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from bot.core.config import settings
+from bot.core.executor import ChatOrderedExecutor
+from bot.core.metrics import metrics
+from bot.core.streams import UpdateProducer
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def create_app(bot: Bot, sink: ChatOrderedExecutor | UpdateProducer) -> web.Application:
+    async def handle_update(request: web.Request) -> web.Response:
+        if settings.WEBHOOK_SECRET and request.headers.get(SECRET_HEADER) != settings.WEBHOOK_SECRET:
+            return web.Response(status=401)
+
+        try:
+            data = await request.json()
+            update = Update.model_validate(data, context={"bot": bot})
+        except Exception as e:
+            logging.warning(f"Rejected webhook payload: {e}")
+            return web.Response(status=400)
+
+        # Answer right away, the update is processed by the executor (or a stream worker)
+        await sink.submit(update)
+        return web.Response()
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.json_response(metrics.snapshot())
+
+    app = web.Application()
+    app.router.add_post(settings.WEBHOOK_PATH, handle_update)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+async def run_webhook(bot: Bot, dp: Dispatcher, sink: UpdateProducer | None = None):
+    """
+    Serves updates over HTTP. Without WEBHOOK_URL the webhook is not registered
+    with Telegram, which allows testing locally by POSTing update JSON.
+    Updates are handled in this process unless a stream producer is given.
+    """
+    executor = None
+    if sink is None:
+        executor = ChatOrderedExecutor(
+            lambda update: dp.feed_update(bot, update),
+            workers=settings.UPDATE_WORKERS,
+            max_queue=settings.UPDATE_QUEUE_SIZE,
+        )
+        executor.start()
+        sink = executor
+
+    if settings.WEBHOOK_URL:
+        await bot.set_webhook(
+            url=settings.WEBHOOK_URL.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=settings.WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+    runner = web.AppRunner(create_app(bot, sink))
+    await runner.setup()
+    site = web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+    await site.start()
+    logging.info(f"Webhook server listening on {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}{settings.WEBHOOK_PATH}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        if executor is not None:
+            await executor.stop()
+        await bot.session.close()
@@ -1,13 +1,22 @@
+import re
 from aiogram import Router, F, types
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from bot.keyboards.admin import get_filters_keyboard, get_filter_settings_keyboard
+from bot.services.filter_set import invalidate_filter_set
+from bot.services.flood import (
+    USER_LIMIT_OPTIONS, CHAT_LIMIT_OPTIONS, parse_flood_pattern, make_flood_pattern, format_limit
+)
+from bot.services.regex_guard import get_disabled, clear_disabled
+from bot.services.regex_safety import analyze_pattern, rewrite_pattern
+from bot.services.domains import host_of, parse_domain_rule, make_domain_rule
 
 router = Router()
 
 class FilterStates(StatesGroup):
     waiting_for_pattern = State()
     waiting_for_smart_word = State()
+    waiting_for_domain = State()
 
 @router.callback_query(F.data.startswith("filters:"))
 async def show_filters(callback: types.CallbackQuery):
@@ -27,6 +36,8 @@ async def edit_filter(callback: types.CallbackQuery):
 
     is_active = False
     current_action = "delete"
+    extra_text = None
+    chat_limit_text = None
     
     async for session in get_session():
         # Check if there are ANY active filters for this type
@@ -43,10 +54,21 @@ async def edit_filter(callback: types.CallbackQuery):
                 is_active = True
             # Get action from the first one (assuming uniform action per type)
             current_action = filters[0].action
+
+            if filter_type == "flood":
+                user_limit, chat_limit = parse_flood_pattern(filters[0].pattern)
+                extra_text, chat_limit_text = format_limit(user_limit), format_limit(chat_limit)
+
+    text = f"Настройка фильтра: {filter_type.upper()}"
+    if filter_type == "regex":
+        disabled = await get_disabled(int(chat_id))
+        if disabled:
+            ids = ", ".join(str(x) for x in sorted(disabled))
+            text += f"\n\n⏱ Отключены из-за таймаутов: {ids}. Упростите выражения и включите фильтр снова."
     
     await callback.message.edit_text(
-        f"Настройка фильтра: {filter_type.upper()}",
-        reply_markup=get_filter_settings_keyboard(chat_id, filter_type, is_active, current_action)
+        text,
+        reply_markup=get_filter_settings_keyboard(chat_id, filter_type, is_active, current_action, extra_text, chat_limit_text)
     )
 
 # Placeholder for Add/Remove logic
@@ -76,7 +98,16 @@ async def save_filter(message: types.Message, state: FSMContext):
                 filter_obj = await session.get(Filter, filter_id)
                 if filter_obj and filter_obj.chat_id == int(chat_id):
                     await session.delete(filter_obj)
+                    if filter_obj.filter_type == "links" and parse_domain_rule(filter_obj.pattern) is None:
+                        # Domain rules only configure the link filter, they go with its last row
+                        stmt = select(Filter).where(Filter.chat_id == int(chat_id), Filter.filter_type == "links", Filter.id != filter_id)
+                        rows = (await session.execute(stmt)).scalars().all()
+                        if all(parse_domain_rule(f.pattern) is not None for f in rows):
+                            for f in rows:
+                                await session.delete(f)
                     await session.commit()
+                    invalidate_filter_set(int(chat_id))
+                    await clear_disabled(int(chat_id), filter_id)
                     await message.answer(f"✅ Фильтр {filter_id} удален.")
                 else:
                     await message.answer("❌ Фильтр не найден.")
@@ -89,20 +120,37 @@ async def save_filter(message: types.Message, state: FSMContext):
     # Handle Creation
     pattern = message.text
     
-    # Auto-convert simple words to smart regex
+    # Auto-convert simple words to smart filters (normalized word lookup)
     if filter_type == "regex":
         # Check if it looks like a manual regex (has special chars)
         special_chars = r"\[](){}^$|*+?"
         if not any(char in pattern for char in special_chars):
-            from bot.services.regex_generator import generate_smart_regex
-            original_pattern = pattern
-            pattern = generate_smart_regex(pattern)
-            await message.answer(f"🪄 Автоматически преобразовано в умный фильтр:\n`{pattern}`")
+            from bot.services.normalizer import make_smart_pattern, parse_smart_pattern
+            smart_pattern = make_smart_pattern(pattern)
+            if parse_smart_pattern(smart_pattern) is not None:
+                pattern = smart_pattern
+                await message.answer(f"🪄 Автоматически преобразовано в умный фильтр:\n`{pattern}`")
+
+        if pattern == message.text:
+            # Manual regex: must compile and must not backtrack catastrophically
+            pattern = rewrite_pattern(pattern)
+            try:
+                re.compile(pattern, re.IGNORECASE)
+            except re.error:
+                await message.answer("❌ Некорректное регулярное выражение.")
+                await state.clear()
+                return
+            problem = analyze_pattern(pattern)
+            if problem:
+                await message.answer(f"❌ Регулярное выражение может выполняться слишком долго: {problem}. Упростите его.")
+                await state.clear()
+                return
 
     async for session in get_session():
         new_filter = Filter(chat_id=int(chat_id), filter_type=filter_type, pattern=pattern, action="delete")
         session.add(new_filter)
         await session.commit()
+    invalidate_filter_set(int(chat_id))
     
     await message.answer(f"✅ Фильтр добавлен для {filter_type}: `{pattern}`")
     await state.clear()
@@ -130,11 +178,17 @@ async def list_filters(callback: types.CallbackQuery):
         await callback.message.answer(f"Список пуст для {filter_type}.")
         return
 
+    disabled = await get_disabled(int(chat_id)) if filter_type == "regex" else set()
+
     text = f"📋 Фильтры ({filter_type}):\n"
     for f in filters:
         status = "🟢" if f.is_active else "🔴"
+        if f.id in disabled and not f.is_active:
+            status += "⏱"
         pat = f.pattern if f.pattern else "(Правило включено)"
         text += f"{f.id}. {status} `{pat}` -> {f.action}\n"
+    if disabled:
+        text += "\n⏱ — отключен автоматически из-за таймаутов"
     
     await callback.message.answer(text)
 
@@ -172,9 +226,19 @@ async def toggle_filter_category(callback: types.CallbackQuery):
             status = "Включено"
             new_state = True
             current_action = "delete"
+    invalidate_filter_set(chat_id)
+    if new_state and filter_type == "regex":
+        # Re-enabled by an admin, timeouts are counted from scratch
+        await clear_disabled(chat_id, *(f.id for f in filters))
+
+    extra_text = None
+    chat_limit_text = None
+    if filter_type == "flood":
+        user_limit, chat_limit = parse_flood_pattern(filters[0].pattern if filters else None)
+        extra_text, chat_limit_text = format_limit(user_limit), format_limit(chat_limit)
 
     await callback.message.edit_reply_markup(
-        reply_markup=get_filter_settings_keyboard(chat_id, filter_type, new_state, current_action)
+        reply_markup=get_filter_settings_keyboard(chat_id, filter_type, new_state, current_action, extra_text, chat_limit_text)
     )
     await callback.answer(f"Фильтр {filter_type}: {status}")
 
@@ -188,6 +252,66 @@ async def remove_filter_prompt(callback: types.CallbackQuery, state: FSMContext)
 
 # Update save_filter to handle removal if action is set
 
+@router.callback_query(F.data.startswith("domain_add:"))
+async def add_domain_prompt(callback: types.CallbackQuery, state: FSMContext):
+    _, chat_id, mode = callback.data.split(":")
+    verb = "разрешить" if mode == "allow" else "запретить"
+    await callback.message.answer(f"Отправьте домены, которые нужно {verb}, через пробел (поддомены тоже попадут под правило):")
+    await state.set_state(FilterStates.waiting_for_domain)
+    await state.update_data(chat_id=chat_id, allowed=mode == "allow")
+
+@router.message(FilterStates.waiting_for_domain)
+async def save_domain_rules(message: types.Message, state: FSMContext):
+    data = await state.get_data()
+    chat_id = int(data["chat_id"])
+    allowed = data["allowed"]
+    await state.clear()
+
+    domains = []
+    for item in (message.text or "").replace(",", " ").split():
+        domain = host_of(item)
+        if domain is None or "." not in domain:
+            await message.answer(f"❌ Некорректный домен: `{item}`")
+            return
+        domains.append(domain)
+    if not domains:
+        await message.answer("❌ Домены не указаны.")
+        return
+
+    from bot.core.database import get_session
+    from bot.core.models import Filter
+    from sqlalchemy import select
+
+    async for session in get_session():
+        stmt = select(Filter).where(Filter.chat_id == chat_id, Filter.filter_type == "links")
+        result = await session.execute(stmt)
+        filters = result.scalars().all()
+
+        # Rules are rows of the links filter and share its state and action
+        main = next((f for f in filters if parse_domain_rule(f.pattern) is None), None)
+        if main is None:
+            main = Filter(chat_id=chat_id, filter_type="links", pattern="*", is_active=False, action="delete")
+            session.add(main)
+
+        existing = {f.pattern: f for f in filters}
+        for domain in domains:
+            # A domain is either allowed or denied
+            opposite = existing.get(make_domain_rule(domain, not allowed))
+            if opposite is not None:
+                await session.delete(opposite)
+            pattern = make_domain_rule(domain, allowed)
+            if pattern not in existing:
+                session.add(Filter(chat_id=chat_id, filter_type="links", pattern=pattern, is_active=main.is_active, action=main.action))
+        await session.commit()
+    invalidate_filter_set(chat_id)
+
+    status = "✅ Разрешены" if allowed else "⛔ Запрещены"
+    await message.answer(f"{status} домены: {', '.join(domains)}")
+    await message.answer(
+        "Назад к фильтрам:",
+        reply_markup=get_filters_keyboard(chat_id)
+    )
+
 @router.callback_query(F.data.startswith("filter_action:"))
 async def select_filter_action(callback: types.CallbackQuery):
     _, chat_id, filter_type = callback.data.split(":")
@@ -224,6 +348,7 @@ async def set_filter_action(callback: types.CallbackQuery):
             session.add(Filter(chat_id=chat_id, filter_type=filter_type, pattern="*", is_active=False, action=action))
             
         await session.commit()
+    invalidate_filter_set(chat_id)
 
     await callback.answer(f"Действие обновлено: {action}")
     # Go back to settings
@@ -255,9 +380,14 @@ async def set_filter_action(callback: types.CallbackQuery):
         else:
             extra_text = "60с"
 
+    chat_limit_text = None
+    if filter_type == "flood" and filters:
+        user_limit, chat_limit = parse_flood_pattern(filters[0].pattern)
+        extra_text, chat_limit_text = format_limit(user_limit), format_limit(chat_limit)
+
     await callback.message.edit_text(
         f"Настройка фильтра: {filter_type.upper()}",
-        reply_markup=get_filter_settings_keyboard(chat_id, filter_type, is_active, current_action, extra_text)
+        reply_markup=get_filter_settings_keyboard(chat_id, filter_type, is_active, current_action, extra_text, chat_limit_text)
     )
 
 @router.callback_query(F.data.startswith("repeats_timer:"))
@@ -295,6 +425,7 @@ async def cycle_repeats_timer(callback: types.CallbackQuery):
             session.add(Filter(chat_id=chat_id, filter_type="repeats", pattern=str(next_val), is_active=False))
             
         await session.commit()
+        invalidate_filter_set(chat_id)
         
         # Refresh UI
         # We need to call edit_filter logic again basically, or just re-render
@@ -307,4 +438,50 @@ async def cycle_repeats_timer(callback: types.CallbackQuery):
         )
         await callback.answer(f"Таймер установлен: {next_val}с")
 
+@router.callback_query(F.data.startswith("flood_limit:"))
+async def cycle_flood_limit(callback: types.CallbackQuery):
+    _, chat_id, scope = callback.data.split(":")
+    chat_id = int(chat_id)
+
+    from bot.core.database import get_session
+    from bot.core.models import Filter
+    from sqlalchemy import select
+
+    async for session in get_session():
+        stmt = select(Filter).where(Filter.chat_id == chat_id, Filter.filter_type == "flood")
+        result = await session.execute(stmt)
+        f = result.scalars().first()
+
+        user_limit, chat_limit = parse_flood_pattern(f.pattern if f else None)
+
+        # Next option of the pressed limit, unknown values start over
+        if scope == "chat":
+            options = CHAT_LIMIT_OPTIONS
+            current = chat_limit
+        else:
+            options = USER_LIMIT_OPTIONS
+            current = user_limit
+        next_val = options[(options.index(current) + 1) % len(options)] if current in options else options[0]
 
+        if scope == "chat":
+            chat_limit = next_val
+        else:
+            user_limit = next_val
+        pattern = make_flood_pattern(user_limit, chat_limit)
+
+        if f:
+            f.pattern = pattern
+        else:
+            # Create if not exists (inactive)
+            f = Filter(chat_id=chat_id, filter_type="flood", pattern=pattern, is_active=False, action="delete")
+            session.add(f)
+
+        await session.commit()
+        invalidate_filter_set(chat_id)
+
+        await callback.message.edit_reply_markup(
+            reply_markup=get_filter_settings_keyboard(
+                chat_id, "flood", f.is_active, f.action, format_limit(user_limit), format_limit(chat_limit)
+            )
+        )
+        await callback.answer(f"Лимит установлен: {format_limit(next_val)}")
@@ -3,6 +3,9 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy import select
 from bot.core.database import get_session
 from bot.core.models import ChatSettings
+from bot.services.filter_set import invalidate_filter_set
+from bot.services.chat_settings import refresh_chat_settings
+from bot.services.domains import parse_domain_rule
 
 router = Router()
 
@@ -32,6 +35,7 @@ async def show_settings(callback: types.CallbackQuery):
             settings = ChatSettings(chat_id=chat_id)
             session.add(settings)
             await session.commit()
+            refresh_chat_settings(settings)
 
         await callback.message.edit_text(
             "⚙️ Настройки чата:",
@@ -63,20 +67,23 @@ async def toggle_setting(callback: types.CallbackQuery):
                 ]
                 
                 for f_type in filter_types:
-                    # Check if filter exists
+                    # Check if filter exists (keywords, regex and links may have several rows)
                     stmt_f = select(Filter).where(Filter.chat_id == chat_id, Filter.filter_type == f_type)
                     result_f = await session.execute(stmt_f)
-                    f = result_f.scalar_one_or_none()
-                    
-                    if f:
+                    rows = result_f.scalars().all()
+
+                    # Domain rules are links rows too and follow the filter's state
+                    for f in rows:
                         f.is_active = True
-                    else:
+                    if not any(parse_domain_rule(f.pattern) is None for f in rows):
                         # Create active filter
                         # For logic filters, pattern is not needed or default
                         # For regex/keywords, we create empty active filter (user can configure later)
                         session.add(Filter(chat_id=chat_id, filter_type=f_type, is_active=True))
             
             await session.commit()
+            refresh_chat_settings(settings)
+            invalidate_filter_set(chat_id)
             
             await callback.message.edit_reply_markup(
                 reply_markup=get_settings_keyboard(chat_id, settings)
@@ -3,6 +3,7 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 from sqlalchemy import select, func, desc
 from bot.core.database import get_session
 from bot.core.models import Log
+from bot.services.filter_stats import filter_stats
 
 router = Router()
 
@@ -59,7 +60,30 @@ async def show_statistics(callback: types.CallbackQuery):
     # Keyboard
     builder = InlineKeyboardBuilder()
     builder.button(text="🔄 Обновить", callback_data=f"stats:{chat_id}")
+    builder.button(text="⏱ Нагрузка фильтров", callback_data=f"filter_stats:{chat_id}")
     builder.button(text="🔙 Назад", callback_data=f"select_chat:{chat_id}")
     builder.adjust(1)
     
     await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode="Markdown")
+
+@router.callback_query(F.data.startswith("filter_stats:"))
+async def show_filter_statistics(callback: types.CallbackQuery):
+    chat_id = int(callback.data.split(":")[1])
+
+    # Counters of this bot instance since its start, heaviest filters first
+    stats = sorted(filter_stats.get(chat_id).values(), key=lambda s: s.seconds, reverse=True)
+
+    text = "⏱ **Нагрузка фильтров**\n\n"
+    if stats:
+        for stat in stats:
+            text += f"- `{stat.label}`: {stat.runs} проверок, {stat.hit_rate:.1%} срабатываний, {stat.cost * 1000:.2f} мс в среднем\n"
+        text += "\nФильтры проверяются от дешевых и частых к дорогим и редким."
+    else:
+        text += "Нет данных\n"
+
+    builder = InlineKeyboardBuilder()
+    builder.button(text="🔄 Обновить", callback_data=f"filter_stats:{chat_id}")
+    builder.button(text="🔙 Назад", callback_data=f"stats:{chat_id}")
+    builder.adjust(1)
+
+    await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode="Markdown")
@@ -1,9 +1,12 @@
 from aiogram import Router, F
-from aiogram.types import ChatMemberUpdated
+from aiogram.types import ChatMemberUpdated, Message
 from aiogram.filters import ChatMemberUpdatedFilter, IS_NOT_MEMBER, MEMBER, ADMINISTRATOR, CREATOR, KICKED
 from sqlalchemy import select, delete
 from bot.core.database import get_session
 from bot.core.models import AdminCache, Chat
+from bot.services import admin_roster, chat_registry
+from bot.services.chat_settings import invalidate_chat_settings
+from bot.services.filter_stats import filter_stats
 
 router = Router()
 
@@ -27,12 +30,16 @@ async def on_bot_added_or_promoted(event: ChatMemberUpdated):
             from bot.core.models import ChatSettings
             session.add(ChatSettings(chat_id=chat.id))
             await session.commit()
+
+            await chat_registry.remember(chat.id, chat.title)
             
         # 2. If bot is admin, fetch all admins and cache them
         new_status = event.new_chat_member.status
         if new_status == "administrator":
             try:
                 admins = await bot.get_chat_administrators(chat.id)
+                # Same answer serves the admin checks of AuthMiddleware
+                await admin_roster.store_roster(chat.id, [admin.user.id for admin in admins])
                 for admin in admins:
                     if admin.user.is_bot:
                         continue
@@ -50,6 +57,7 @@ async def on_bot_added_or_promoted(event: ChatMemberUpdated):
 
 @router.chat_member(ChatMemberUpdatedFilter(member_status_changed=MEMBER >> ADMINISTRATOR))
 async def on_admin_promoted(event: ChatMemberUpdated):
+    await admin_roster.add_admin(event.chat.id, event.new_chat_member.user.id)
     async for session in get_session():
         # Add to cache
         cache = AdminCache(chat_id=event.chat.id, user_id=event.new_chat_member.user.id)
@@ -62,6 +70,7 @@ async def on_admin_promoted(event: ChatMemberUpdated):
 @router.chat_member(ChatMemberUpdatedFilter(member_status_changed=CREATOR >> MEMBER))
 @router.chat_member(ChatMemberUpdatedFilter(member_status_changed=CREATOR >> IS_NOT_MEMBER))
 async def on_admin_demoted(event: ChatMemberUpdated):
+    await admin_roster.remove_admin(event.chat.id, event.new_chat_member.user.id)
     async for session in get_session():
         stmt = delete(AdminCache).where(
             AdminCache.chat_id == event.chat.id,
@@ -76,8 +85,21 @@ async def on_admin_demoted(event: ChatMemberUpdated):
 @router.my_chat_member(ChatMemberUpdatedFilter(member_status_changed=ADMINISTRATOR >> KICKED))
 async def on_bot_removed(event: ChatMemberUpdated):
     # Bot removed from chat
+    await forget_chat(event.chat.id)
     async for session in get_session():
         # Clear all admin cache for this chat
         stmt = delete(AdminCache).where(AdminCache.chat_id == event.chat.id)
         await session.execute(stmt)
         await session.commit()
+
+@router.message(F.migrate_to_chat_id)
+async def on_chat_migrated(message: Message):
+    # Group upgraded to a supergroup, the old id is not used any more
+    await forget_chat(message.chat.id)
+
+async def forget_chat(chat_id: int):
+    await admin_roster.forget(chat_id)
+    await chat_registry.forget(chat_id)
+    filter_stats.forget(chat_id)
+    # Kept in the database, reloaded if the bot comes back
+    invalidate_chat_settings(chat_id)
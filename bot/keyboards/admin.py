@@ -48,7 +48,8 @@ def get_filters_keyboard(chat_id: int) -> InlineKeyboardMarkup:
         ("Mat", "Мат"), 
         ("Repeats", "Повторы"), 
         ("CAPS", "CAPS"), 
-        ("Media", "Медиа")
+        ("Media", "Медиа"),
+        ("Flood", "Флуд")
     ]
     for f_code, f_name in filters:
         builder.button(text=f"🔹 {f_name}", callback_data=f"filter_edit:{chat_id}:{f_code.lower()}")
@@ -56,7 +57,7 @@ def get_filters_keyboard(chat_id: int) -> InlineKeyboardMarkup:
     builder.adjust(2)
     return builder.as_markup()
 
-def get_filter_settings_keyboard(chat_id: int, filter_type: str, is_active: bool, current_action: str = "delete", extra_text: str = None) -> InlineKeyboardMarkup:
+def get_filter_settings_keyboard(chat_id: int, filter_type: str, is_active: bool, current_action: str = "delete", extra_text: str = None, chat_limit_text: str = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     status_icon = "🟢" if is_active else "🔴"
     
@@ -69,7 +70,7 @@ def get_filter_settings_keyboard(chat_id: int, filter_type: str, is_active: bool
     action_text = action_map.get(current_action, "Удаление")
     
     # Logic-based filters don't need pattern management
-    logic_filters = ["caps", "contacts", "repeats", "media", "crypto", "links", "channels"]
+    logic_filters = ["caps", "contacts", "repeats", "media", "crypto", "links", "channels", "flood"]
     
     if filter_type in logic_filters:
         builder.button(text=f"Вкл/Выкл {status_icon}", callback_data=f"filter_toggle:{chat_id}:{filter_type}")
@@ -79,6 +80,20 @@ def get_filter_settings_keyboard(chat_id: int, filter_type: str, is_active: bool
             timer_label = extra_text if extra_text else "60с"
             builder.button(text=f"⏱ Таймер ({timer_label})", callback_data=f"repeats_timer:{chat_id}")
 
+        if filter_type == "flood":
+            # Messages per seconds, for each user and for the whole chat
+            user_label = extra_text if extra_text else "5/10с"
+            chat_label = chat_limit_text if chat_limit_text else "выкл"
+            builder.button(text=f"👤 Лимит ({user_label})", callback_data=f"flood_limit:{chat_id}:user")
+            builder.button(text=f"👥 Весь чат ({chat_label})", callback_data=f"flood_limit:{chat_id}:chat")
+
+        if filter_type == "links":
+            # Domain allow/deny rules, stored as rows of this filter
+            builder.button(text="✅ Разрешить домен", callback_data=f"domain_add:{chat_id}:allow")
+            builder.button(text="⛔ Запретить домен", callback_data=f"domain_add:{chat_id}:deny")
+            builder.button(text="📋 Домены", callback_data=f"filter_list:{chat_id}:{filter_type}")
+            builder.button(text="➖ Удалить домен", callback_data=f"filter_rem:{chat_id}:{filter_type}")
+
         builder.button(text="🔙 Назад", callback_data=f"filters:{chat_id}")
         builder.adjust(1)
     else:
@@ -1,4 +1,5 @@
 from .auth import AuthMiddleware
 from .chat_management import ChatManagementMiddleware
+from .database import DatabaseMiddleware
 
-__all__ = ["AuthMiddleware", "ChatManagementMiddleware"]
+__all__ = ["AuthMiddleware", "ChatManagementMiddleware", "DatabaseMiddleware"]
@@ -1,12 +1,12 @@
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, TelegramObject
-from aiogram.enums import ChatMemberStatus
 from sqlalchemy import select
 from bot.core.loader import bot
-from bot.core.redis import redis_client
-from bot.core.database import get_session
+from bot.core.near_cache import near_cache
+from bot.core.database import LazySession
 from bot.core.models import AdminCache
+from bot.services import admin_roster
 
 class AuthMiddleware(BaseMiddleware):
     async def __call__(
@@ -39,7 +39,7 @@ class AuthMiddleware(BaseMiddleware):
                 # But we might want to flag "is_admin" in data
             else:
                 # Sync to DB if admin
-                await self.sync_admin_to_db(chat.id, user.id)
+                await self.sync_admin_to_db(chat.id, user.id, data["db"])
             
             data["is_admin"] = is_admin
 
@@ -59,34 +59,23 @@ class AuthMiddleware(BaseMiddleware):
         return await handler(event, data)
 
     async def check_admin(self, chat_id: int, user_id: int) -> bool:
-        cache_key = f"admin:{chat_id}:{user_id}"
-        cached = await redis_client.get(cache_key)
-        
-        if cached is not None:
-            return cached == "1"
-
-        try:
-            member = await bot.get_chat_member(chat_id, user_id)
-            is_admin = member.status in [ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.CREATOR]
-            
-            # Cache for 5 minutes (short cache as per requirements to be strict)
-            await redis_client.setex(cache_key, 300, "1" if is_admin else "0")
-            return is_admin
-        except Exception:
-            return False
+        # Membership test against the chat's admin roster, one
+        # get_chat_administrators call per chat instead of one call per user.
+        # A roster that fails to load counts as empty for a short while.
+        return await admin_roster.is_admin(bot, chat_id, user_id)
 
-    async def sync_admin_to_db(self, chat_id: int, user_id: int):
+    async def sync_admin_to_db(self, chat_id: int, user_id: int, db: LazySession):
         # Optimization: Check a separate redis key to avoid DB spam
         sync_key = f"db_synced:{chat_id}:{user_id}"
-        if await redis_client.get(sync_key):
+        if await near_cache.get(sync_key):
             return
 
-        async for session in get_session():
-            stmt = select(AdminCache).where(AdminCache.chat_id == chat_id, AdminCache.user_id == user_id)
-            result = await session.execute(stmt)
-            if not result.scalar_one_or_none():
-                session.add(AdminCache(chat_id=chat_id, user_id=user_id))
-                await session.commit()
+        # Committed together with the rest of the update
+        session = await db.get()
+        stmt = select(AdminCache).where(AdminCache.chat_id == chat_id, AdminCache.user_id == user_id)
+        result = await session.execute(stmt)
+        if not result.scalar_one_or_none():
+            session.add(AdminCache(chat_id=chat_id, user_id=user_id))
         
-        # Mark as synced for 1 hour
-        await redis_client.setex(sync_key, 3600, "1")
+        # Mark as synced for 1 hour, once the row is committed
+        db.after_commit(lambda: near_cache.setex(sync_key, 3600, "1"))
@@ -2,8 +2,9 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, ChatMemberUpdated
 from sqlalchemy import select
-from bot.core.database import get_session
+from bot.core.database import LazySession
 from bot.core.models import Chat, ChatSettings
+from bot.services import chat_registry
 
 class ChatManagementMiddleware(BaseMiddleware):
     async def __call__(
@@ -18,32 +19,29 @@ class ChatManagementMiddleware(BaseMiddleware):
             return await handler(event, data)
 
         # Register chat if not exists
-        # We use a simple check. Optimization: Cache "known chats" in Redis to avoid DB hit every msg
-        
-        # For now, let's do a quick DB check or upsert. 
-        # To be efficient, we might only do this on specific events or use a localized cache.
-        # But "ChatManagementMiddleware" usually implies ensuring the chat is in DB.
-        
-        # Let's use the session from data (we need to inject it first or create it)
-        # We'll create a session here or assume a DB middleware runs before. 
-        # Let's create a session context here for safety.
-        
-        async for session in get_session():
-            stmt = select(Chat).where(Chat.id == chat.id)
-            result = await session.execute(stmt)
-            db_chat = result.scalar_one_or_none()
+        # Known chats (same title) are answered from memory/Redis without touching the DB
+        if await chat_registry.is_known(chat.id, chat.title):
+            return await handler(event, data)
+
+        # The session comes from DatabaseMiddleware and is committed after the handler
+        db: LazySession = data["db"]
+        session = await db.get()
+
+        stmt = select(Chat).where(Chat.id == chat.id)
+        result = await session.execute(stmt)
+        db_chat = result.scalar_one_or_none()
 
-            if not db_chat:
-                db_chat = Chat(id=chat.id, title=chat.title)
-                session.add(db_chat)
-                
-                # Create default settings
-                settings = ChatSettings(chat_id=chat.id)
-                session.add(settings)
-                
-                await session.commit()
-            elif db_chat.title != chat.title:
-                db_chat.title = chat.title
-                await session.commit()
+        if not db_chat:
+            db_chat = Chat(id=chat.id, title=chat.title)
+            session.add(db_chat)
+            
+            # Create default settings
+            settings = ChatSettings(chat_id=chat.id)
+            session.add(settings)
+            await session.flush()
+        elif db_chat.title != chat.title:
+            db_chat.title = chat.title
         
+        # Only known once the row is actually committed
+        db.after_commit(lambda: chat_registry.remember(chat.id, chat.title))
         return await handler(event, data)
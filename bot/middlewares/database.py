@@ -0,0 +1,21 @@
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from bot.core.database import LazySession
+
+class DatabaseMiddleware(BaseMiddleware):
+    """
+    Injects a lazily opened session as data["db"]. Updates that never touch
+    the database never check out a pool connection.
+    Register as an outer middleware on dp.update so every handler shares it.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with LazySession() as db:
+            data["db"] = db
+            return await handler(event, data)
@@ -0,0 +1,134 @@
+import logging
+from aiogram import Bot
+from redis.exceptions import LockError
+from bot.core.config import settings
+from bot.core.redis import redis_client
+from bot.core.memory_cache import MemoryCache
+from bot.core.invalidation import bus
+from bot.core.lru import LRUCache
+from bot.core.metrics import metrics
+from bot.core.singleflight import SingleFlight
+
+# Admins of a chat are kept as a Redis set, fetched with one get_chat_administrators
+# call and updated from chat_member events. The sentinel keeps an empty
+# roster from looking like a missing one.
+SENTINEL = "-"
+
+# Local copies, dropped on other instances when a roster changes
+_local = LRUCache(maxsize=settings.NEAR_CACHE_SIZE, ttl=settings.NEAR_CACHE_TTL)
+_loads = SingleFlight("admin_roster")
+# Chats whose roster failed to load, every user is a non-admin there meanwhile
+_failed = LRUCache(maxsize=settings.NEAR_CACHE_SIZE, ttl=settings.ADMIN_ROSTER_FAILURE_TTL)
+
+def _key(chat_id: int) -> str:
+    return f"admins:{chat_id}"
+
+async def is_admin(bot: Bot, chat_id: int, user_id: int) -> bool:
+    return user_id in await get_roster(bot, chat_id)
+
+async def get_roster(bot: Bot, chat_id: int) -> frozenset[int]:
+    roster = _local.get(chat_id)
+    if roster is not None:
+        metrics.incr("admin_roster.hit")
+        return roster
+    if _failed.get(chat_id):
+        metrics.incr("admin_roster.failed_cached")
+        return frozenset()
+
+    metrics.incr("admin_roster.miss")
+    # Concurrent misses for a chat share one load
+    try:
+        return await _loads.do(chat_id, lambda: _load(bot, chat_id))
+    except Exception as e:
+        # Not retried on every message while Telegram or Redis is failing
+        metrics.incr("admin_roster.failed")
+        logging.warning(f"Failed to load admins of {chat_id}: {e}")
+        _failed.set(chat_id, True)
+        return frozenset()
+
+async def _load(bot: Bot, chat_id: int) -> frozenset[int]:
+    roster = await _read(chat_id)
+    if roster is not None:
+        return roster
+
+    if not settings.ADMIN_CHECK_LOCK or isinstance(redis_client, MemoryCache):
+        return await fetch_roster(bot, chat_id)
+
+    # Across instances: whoever holds the lock asks Telegram, the others
+    # wait for it and read the roster it stored
+    try:
+        async with redis_client.lock(
+            f"lock:{_key(chat_id)}",
+            timeout=settings.ADMIN_CHECK_LOCK_TIMEOUT,
+            blocking_timeout=settings.ADMIN_CHECK_LOCK_TIMEOUT,
+        ):
+            roster = await _read(chat_id)
+            if roster is not None:
+                return roster
+            return await fetch_roster(bot, chat_id)
+    except LockError:
+        # Holder is stuck, do not wait any longer
+        return await fetch_roster(bot, chat_id)
+
+async def _read(chat_id: int) -> frozenset[int] | None:
+    members = await redis_client.smembers(_key(chat_id))
+    if not members:
+        return None
+    roster = frozenset(int(m) for m in members if m != SENTINEL)
+    _local.set(chat_id, roster)
+    return roster
+
+async def fetch_roster(bot: Bot, chat_id: int) -> frozenset[int]:
+    admins = await bot.get_chat_administrators(chat_id)
+    metrics.incr("admin_roster.fetched")
+    return await store_roster(chat_id, [admin.user.id for admin in admins])
+
+async def store_roster(chat_id: int, user_ids: list[int]) -> frozenset[int]:
+    key = _key(chat_id)
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(key)
+        pipe.sadd(key, SENTINEL, *user_ids)
+        pipe.expire(key, settings.ADMIN_ROSTER_TTL)
+        await pipe.execute()
+
+    roster = frozenset(user_ids)
+    _changed(chat_id, roster)
+    return roster
+
+async def add_admin(chat_id: int, user_id: int):
+    await _update(chat_id, user_id, True)
+
+async def remove_admin(chat_id: int, user_id: int):
+    await _update(chat_id, user_id, False)
+
+async def _update(chat_id: int, user_id: int, add: bool):
+    key = _key(chat_id)
+    # A roster that was never loaded stays missing, the next check loads it whole
+    if not await redis_client.exists(key):
+        _changed(chat_id, None)
+        return
+    if add:
+        await redis_client.sadd(key, user_id)
+    else:
+        await redis_client.srem(key, user_id)
+    _changed(chat_id, None)
+
+async def forget(chat_id: int):
+    await redis_client.delete(_key(chat_id))
+    _changed(chat_id, None)
+
+def _changed(chat_id: int, roster: frozenset[int] | None):
+    _failed.pop(chat_id)
+    if roster is None:
+        _local.pop(chat_id)
+    else:
+        _local.set(chat_id, roster)
+    bus.publish_soon("roster", str(chat_id))
+
+def _on_remote_invalidation(key: str | None):
+    if key is None:
+        _local.clear()
+    else:
+        _local.pop(int(key))
+
+bus.subscribe("roster", _on_remote_invalidation)
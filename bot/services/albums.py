@@ -0,0 +1,66 @@
+import asyncio
+import logging
+from aiogram import Bot
+from aiogram.types import Message
+from bot.core.config import settings
+from bot.core.streams import Acknowledgement, defer_ack
+from bot.services.moderation import moderate_batch
+
+class AlbumBuffer:
+    """
+    Telegram sends the items of an album as separate updates a moment apart.
+    They are held for a short window and then moderated as one unit, so an
+    album gets one verdict, one delete call, one punishment and one log row.
+    In stream workers the items' entries are acknowledged only after that.
+    """
+
+    def __init__(self, delay: float = 1.0):
+        self.delay = delay
+        self._albums: dict[tuple[int, str], list[Message]] = {}
+        self._acks: dict[tuple[int, str], list[Acknowledgement]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    def add(self, bot: Bot, message: Message):
+        key = (message.chat.id, message.media_group_id)
+        album = self._albums.get(key)
+        if album is None:
+            album = self._albums[key] = []
+            self._acks[key] = []
+            # The update handler returns at once, the chat's queue is not held up
+            task = asyncio.create_task(self._flush_later(bot, key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        album.append(message)
+
+        ack = defer_ack()
+        if ack is not None:
+            self._acks[key].append(ack)
+
+    async def _flush_later(self, bot: Bot, key: tuple[int, str]):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), self.delay)
+        except asyncio.TimeoutError:
+            pass
+        album = self._albums.pop(key)
+        acks = self._acks.pop(key)
+        album.sort(key=lambda m: m.message_id)
+        try:
+            await moderate_batch(bot, album)
+        except Exception as e:
+            # Unacknowledged entries are redelivered to the stream worker
+            logging.error(f"Failed to moderate album {key[1]} in {key[0]}: {e}")
+            return
+        for ack in acks:
+            try:
+                await ack()
+            except Exception as e:
+                logging.error(f"Failed to acknowledge {ack.entry_id}: {e}")
+
+    async def stop(self):
+        # Albums still in the window are moderated right away
+        self._stopping.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+album_buffer = AlbumBuffer(delay=settings.ALBUM_BUFFER_DELAY)
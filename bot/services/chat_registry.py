@@ -0,0 +1,45 @@
+from sqlalchemy import select
+from bot.core.config import settings
+from bot.core.database import get_session
+from bot.core.lru import LRUCache
+from bot.core.models import Chat
+from bot.core.redis import redis_client
+
+# chat_id -> title of chats known to exist in guard_chats
+_known = LRUCache(maxsize=settings.KNOWN_CHATS_CACHE_SIZE)
+
+KNOWN_CHAT_TTL = 86400 # Seconds
+
+def _key(chat_id: int) -> str:
+    return f"known_chat:{chat_id}"
+
+async def is_known(chat_id: int, title: str | None) -> bool:
+    """True if the chat row exists with this title, so no DB work is needed."""
+    title = title or ""
+    cached = _known.get(chat_id)
+    if cached is not None:
+        return cached == title
+
+    # Another instance may already have registered it
+    cached = await redis_client.get(_key(chat_id))
+    if cached is not None:
+        _known.set(chat_id, cached)
+        return cached == title
+    return False
+
+async def remember(chat_id: int, title: str | None):
+    title = title or ""
+    _known.set(chat_id, title)
+    await redis_client.set(_key(chat_id), title, ex=KNOWN_CHAT_TTL)
+
+async def forget(chat_id: int):
+    _known.pop(chat_id)
+    await redis_client.delete(_key(chat_id))
+
+async def warm_up() -> int:
+    """Loads known chats from guard_chats into memory, as many as the cache holds."""
+    async for session in get_session():
+        result = await session.execute(select(Chat.id, Chat.title).limit(_known.maxsize))
+        for chat_id, title in result.all():
+            _known.set(chat_id, title or "")
+    return len(_known)
@@ -0,0 +1,78 @@
+from dataclasses import dataclass
+from sqlalchemy import select
+from bot.core.config import settings
+from bot.core.database import LazySession, get_session
+from bot.core.invalidation import bus
+from bot.core.lru import LRUCache
+from bot.core.models import ChatSettings
+
+@dataclass(frozen=True, slots=True)
+class ChatSettingsSnapshot:
+    """Read-only copy of a chat's settings, safe to share between handlers."""
+
+    chat_id: int
+    language: str = "ru"
+    strict_mode: bool = False
+    log_channel_id: int | None = None
+    delete_delay: int = 0
+    ignore_admins: bool = True
+
+    @classmethod
+    def from_model(cls, model: ChatSettings) -> "ChatSettingsSnapshot":
+        # Column defaults are only applied on flush, fall back to ours
+        defaults = cls(chat_id=model.chat_id)
+        return cls(
+            chat_id=model.chat_id,
+            language=model.language if model.language is not None else defaults.language,
+            strict_mode=model.strict_mode if model.strict_mode is not None else defaults.strict_mode,
+            log_channel_id=model.log_channel_id,
+            delete_delay=model.delete_delay if model.delete_delay is not None else defaults.delete_delay,
+            ignore_admins=model.ignore_admins if model.ignore_admins is not None else defaults.ignore_admins,
+        )
+
+_cache = LRUCache(maxsize=settings.SETTINGS_CACHE_SIZE, ttl=settings.SETTINGS_CACHE_TTL)
+
+async def get_chat_settings(chat_id: int, db: LazySession) -> ChatSettingsSnapshot:
+    snapshot = _cache.get(chat_id)
+    if snapshot is not None:
+        return snapshot
+
+    session = await db.get()
+    stmt = select(ChatSettings).where(ChatSettings.chat_id == chat_id)
+    result = await session.execute(stmt)
+    model = result.scalar_one_or_none()
+
+    snapshot = ChatSettingsSnapshot.from_model(model) if model else ChatSettingsSnapshot(chat_id=chat_id)
+    _cache.set(chat_id, snapshot)
+    return snapshot
+
+def refresh_chat_settings(model: ChatSettings) -> ChatSettingsSnapshot:
+    """Replaces the cached snapshot after settings were changed."""
+    snapshot = ChatSettingsSnapshot.from_model(model)
+    _cache.set(model.chat_id, snapshot)
+    bus.publish_soon("settings", str(model.chat_id))
+    return snapshot
+
+def invalidate_chat_settings(chat_id: int):
+    """Drops the cached snapshot of a chat the bot no longer serves, on all instances."""
+    _cache.pop(chat_id)
+    bus.publish_soon("settings", str(chat_id))
+
+def _on_remote_invalidation(key: str | None):
+    # Reloaded from the database on next use
+    if key is None:
+        _cache.clear()
+    else:
+        _cache.pop(int(key))
+
+bus.subscribe("settings", _on_remote_invalidation)
+
+async def warm_up() -> int:
+    """Preloads settings of all chats so the moderation path does no I/O."""
+    count = 0
+    async for session in get_session():
+        result = await session.execute(select(ChatSettings))
+        for model in result.scalars().all():
+            _cache.set(model.chat_id, ChatSettingsSnapshot.from_model(model))
+            count += 1
+    return count
@@ -0,0 +1,94 @@
+from urllib.parse import urlsplit
+
+# Domain rules are stored as "links" filter rows with pattern "allow:<domain>" or "deny:<domain>"
+ALLOW_PREFIX = "allow:"
+DENY_PREFIX = "deny:"
+
+_RULE = "" # Key of a node's own rule, labels are never empty
+
+def normalize_domain(domain: str) -> str | None:
+    domain = domain.strip().strip(".").lower()
+    if not domain or any(c.isspace() for c in domain):
+        return None
+    try:
+        # Rules and links may use either form of an internationalized domain
+        domain = domain.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+    return domain
+
+def host_of(url: str) -> str | None:
+    """Host of a link as found in a message, with or without a scheme."""
+    url = url.strip()
+    if "://" not in url:
+        url = "http://" + url
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    return normalize_domain(host) if host else None
+
+def parse_domain_rule(pattern: str | None) -> tuple[bool, str] | None:
+    """(allowed, domain) of a rule row, None for other rows."""
+    if not pattern:
+        return None
+    for prefix, allowed in ((ALLOW_PREFIX, True), (DENY_PREFIX, False)):
+        if pattern.startswith(prefix):
+            domain = normalize_domain(pattern[len(prefix):])
+            return (allowed, domain) if domain else None
+    return None
+
+def make_domain_rule(domain: str, allowed: bool) -> str:
+    return (ALLOW_PREFIX if allowed else DENY_PREFIX) + domain
+
+class DomainRules:
+    """
+    Allow/deny rules of a chat in a trie keyed by reversed labels
+    (com -> example -> ads), a rule covers the domain and its subdomains.
+    The most specific rule wins. Unlisted domains are blocked, unless the
+    chat only has deny rules.
+    """
+
+    __slots__ = ("_root", "has_allow", "has_deny")
+
+    def __init__(self, rules: list[tuple[bool, str]] = ()):
+        self._root: dict = {}
+        self.has_allow = False
+        self.has_deny = False
+        for allowed, domain in rules:
+            self.add(domain, allowed)
+
+    def add(self, domain: str, allowed: bool):
+        node = self._root
+        for label in reversed(domain.split(".")):
+            if label:
+                node = node.setdefault(label, {})
+        node[_RULE] = allowed
+        if allowed:
+            self.has_allow = True
+        else:
+            self.has_deny = True
+
+    def lookup(self, host: str) -> bool | None:
+        """True if allowed, False if denied, None if no rule covers the host."""
+        node = self._root
+        found = None
+        for label in reversed(host.split(".")):
+            if not label:
+                continue
+            node = node.get(label)
+            if node is None:
+                break
+            found = node.get(_RULE, found)
+        return found
+
+    def is_blocked(self, host: str | None) -> bool:
+        if host is None:
+            return True
+        allowed = self.lookup(host)
+        if allowed is None:
+            return not (self.has_deny and not self.has_allow)
+        return not allowed
+
+    def __bool__(self) -> bool:
+        return self.has_allow or self.has_deny
@@ -0,0 +1,350 @@
+import hashlib
+import re
+try:
+    from re import _parser as sre_parse
+except ImportError: # Python < 3.11
+    import sre_parse
+from sqlalchemy import select
+from bot.core.config import settings
+from bot.core.database import get_session
+from bot.core.invalidation import bus
+from bot.core.lru import LRUCache
+from bot.core.models import Filter
+from bot.core.singleflight import SingleFlight
+from bot.services.keyword_matcher import KeywordMatcher, parse_keywords
+from bot.services.normalizer import normalize, make_smart_pattern, parse_smart_pattern, smart_variants
+from bot.services.regex_generator import recover_smart_word
+from bot.services.flood import parse_flood_pattern
+from bot.services.regex_safety import analyze_pattern, rewrite_pattern
+from bot.services.domains import DomainRules, parse_domain_rule
+from bot.services.filter_stats import MIN_RUNS, FilterStat, filter_stats
+
+class CompiledFilter:
+    """
+    A single filter row prepared for evaluation: regexes are compiled,
+    keyword lists are built into a matcher, the repeats timer and flood
+    limits are parsed. Regexes that may backtrack catastrophically are
+    marked to run in the sandbox. Link filters get the chat's domain rules
+    from ChatFilterSet.
+    """
+
+    __slots__ = ("id", "filter_type", "action", "pattern", "regex", "smart_word", "matcher", "timer", "user_limit", "chat_limit", "sandboxed", "domains")
+
+    def __init__(self, f: Filter):
+        self.id = f.id
+        # The admin panel uses "links", older rows may still use "link"
+        self.filter_type = "link" if f.filter_type == "links" else f.filter_type
+        self.action = f.action or "delete"
+        self.pattern = f.pattern
+        self.regex = None
+        self.smart_word = None
+        self.matcher = None
+        self.timer = 60
+        self.user_limit = None
+        self.chat_limit = None
+        self.sandboxed = False
+        self.domains = None
+
+        if self.filter_type == "regex" and f.pattern:
+            self.smart_word = parse_smart_pattern(f.pattern)
+            if self.smart_word is not None:
+                # Words saved under an older folding are brought to the current one
+                self.smart_word = normalize(self.smart_word) or None
+            else:
+                # Rows generated before smart filters were normalized
+                legacy_word = recover_smart_word(f.pattern)
+                if legacy_word is not None:
+                    self.smart_word = normalize(legacy_word) or None
+
+            if self.smart_word is None:
+                # Rows saved before patterns were checked may still be risky
+                self.pattern = rewrite_pattern(f.pattern)
+                try:
+                    self.regex = re.compile(self.pattern, re.IGNORECASE)
+                except re.error:
+                    pass
+                else:
+                    self.sandboxed = settings.REGEX_SANDBOX_ALL or analyze_pattern(self.pattern) is not None
+        elif self.filter_type in ("keywords", "mat") and f.pattern:
+            # Built once per load, every message is then scanned in a single pass
+            self.matcher = KeywordMatcher(parse_keywords(f.pattern))
+        elif self.filter_type == "repeats":
+            # Timer is stored in pattern (default 60)
+            try:
+                self.timer = int(f.pattern)
+            except (ValueError, TypeError):
+                self.timer = 60
+        elif self.filter_type == "flood":
+            self.user_limit, self.chat_limit = parse_flood_pattern(f.pattern)
+
+    @property
+    def stat_key(self) -> str:
+        return str(self.id)
+
+    @property
+    def label(self) -> str:
+        return f"{self.filter_type} #{self.id}"
+
+    @property
+    def is_usable(self) -> bool:
+        # Pattern based filters without a (valid) pattern can never match
+        if self.filter_type == "regex":
+            return self.regex is not None or self.smart_word is not None
+        if self.filter_type in ("keywords", "mat"):
+            return bool(self.matcher)
+        return True
+
+_GROUP_REFS = {sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS}
+
+def _has_group_refs(items) -> bool:
+    for op, av in items:
+        if op in _GROUP_REFS:
+            return True
+        # Walk nested subpatterns (branches, repeats, groups, lookarounds)
+        children = av if isinstance(av, (list, tuple)) else ()
+        for child in children:
+            if isinstance(child, sre_parse.SubPattern):
+                if _has_group_refs(child):
+                    return True
+            elif isinstance(child, (list, tuple)):
+                for sub in child:
+                    if isinstance(sub, sre_parse.SubPattern) and _has_group_refs(sub):
+                        return True
+    return False
+
+def is_combinable(f: CompiledFilter) -> bool:
+    # A pattern can be embedded into the shared alternation unless it relies on
+    # group numbering/names (backrefs, own named groups) or global inline flags.
+    if f.regex is None or f.regex.groupindex or f.sandboxed:
+        return False
+    try:
+        parsed = sre_parse.parse(f.pattern)
+        # Global flags like (?s) or (?x) would apply to every filter of the group,
+        # Python 3.10 still accepts them mid-pattern
+        if parsed.state.flags & ~re.UNICODE or _has_group_refs(parsed):
+            return False
+        re.compile(f"(?P<f{f.id}>{f.pattern})")
+    except (re.error, RecursionError):
+        return False
+    return True
+
+class RegexGroup:
+    """
+    All combinable regex filters of a chat merged into a single alternation.
+    Each filter is wrapped in a named group so the matching row is known.
+    """
+
+    filter_type = "regex"
+    stat_key = "regex_group"
+
+    def __init__(self, filters: list[CompiledFilter]):
+        self.filters = {f"f{f.id}": f for f in filters}
+        self.label = f"regex ×{len(filters)}"
+        combined = "|".join(f"(?P<{name}>{f.pattern})" for name, f in self.filters.items())
+        self.regex = re.compile(combined, re.IGNORECASE)
+
+    def search(self, text: str) -> CompiledFilter | None:
+        match = self.regex.search(text)
+        if not match:
+            return None
+        # The wrapper group closes last, so lastgroup is the filter's group
+        name = match.lastgroup
+        if name not in self.filters:
+            name = next(k for k, v in match.groupdict().items() if v is not None)
+        return self.filters[name]
+
+class SmartGroup:
+    """
+    Smart (normalized word) filters of a chat in one keyword automaton,
+    matched against the normalized message text. Every word is added with
+    its spellings using look-alikes shared by two letters.
+    """
+
+    filter_type = "regex"
+    stat_key = "smart_group"
+
+    def __init__(self, filters: list[CompiledFilter]):
+        self.filters = filters
+        self.label = f"умные слова ×{len(filters)}"
+        self.matcher = KeywordMatcher()
+        for f in filters:
+            for variant in smart_variants(f.smart_word):
+                self.matcher.add(variant, f)
+        self.matcher.build()
+
+    def search(self, text_normalized: str) -> CompiledFilter | None:
+        return self.matcher.search(text_normalized)
+
+def config_version(filters: list[Filter]) -> bytes:
+    # Same rows in the same order give the same version, in any chat
+    digest = hashlib.blake2b(digest_size=16)
+    for f in filters:
+        digest.update(f"{f.filter_type}\0{f.pattern}\0{f.action}\n".encode())
+    return digest.digest()
+
+# Checked first in this order: flood has to count every message, the
+# others only look at message metadata
+PINNED_TYPES = ("flood", "channels", "media")
+
+class ChatFilterSet:
+    """Active filters of one chat, compiled once and reused for every message."""
+
+    def __init__(self, chat_id: int, filters: list[Filter]):
+        self.chat_id = chat_id
+        self.version = config_version(filters)
+
+        # Domain rule rows only configure the chat's link filter
+        rules = []
+        rows = []
+        for f in filters:
+            rule = parse_domain_rule(f.pattern) if f.filter_type in ("link", "links") else None
+            if rule is not None:
+                rules.append(rule)
+            else:
+                rows.append(f)
+        domains = DomainRules(rules) if rules else None
+
+        compiled = [f for f in (CompiledFilter(f) for f in rows) if f.is_usable]
+        for f in compiled:
+            if f.filter_type == "link":
+                f.domains = domains
+
+        # Regex filters are scanned together, at the position of the first one
+        smart = [f for f in compiled if f.smart_word is not None]
+        self.smart_group = SmartGroup(smart) if smart else None
+
+        # Sandboxed regexes are matched one by one, under the message's time budget
+        combinable = [f for f in compiled if f.filter_type == "regex" and f.regex is not None and is_combinable(f)]
+        self.regex_group = None
+        if len(combinable) > 1:
+            try:
+                self.regex_group = RegexGroup(combinable)
+            except re.error:
+                self.regex_group = None
+
+        grouped = set(self.regex_group.filters.values()) if self.regex_group else set()
+        # Flood limits are checked before any text filter, they cost O(1)
+        # and every message has to be counted
+        self.filters = [f for f in compiled if f.filter_type == "flood"]
+        for f in compiled:
+            if f.filter_type == "flood":
+                continue
+            if f.smart_word is not None:
+                if f is smart[0]:
+                    self.filters.append(self.smart_group)
+            elif f not in grouped:
+                self.filters.append(f)
+            elif f is combinable[0]:
+                self.filters.append(self.regex_group)
+
+        self.compiled = compiled
+        self.entry_of = self._index(self.filters)
+
+    def _index(self, filters: list) -> list[int]:
+        # Position in filters of every compiled filter, for cached verdicts
+        entries = {}
+        for i, entry in enumerate(filters):
+            if isinstance(entry, RegexGroup):
+                entries.update((f, i) for f in entry.filters.values())
+            elif isinstance(entry, SmartGroup):
+                entries.update((f, i) for f in entry.filters)
+            else:
+                entries[entry] = i
+        return [entries[f] for f in self.compiled]
+
+    def reorder(self, stats: dict[str, FilterStat]):
+        """
+        Sorts filters by expected cost: pinned metadata checks first, then by
+        time per run over hit rate. Filters without enough runs yet keep
+        their place at the front so they get measured.
+        """
+        def key(entry):
+            if entry.filter_type in PINNED_TYPES:
+                return 0, PINNED_TYPES.index(entry.filter_type)
+            stat = stats.get(entry.stat_key)
+            if stat is None or stat.runs < MIN_RUNS:
+                return 1, 0
+            return 1, stat.expected_cost
+
+        filters = sorted(self.filters, key=key)
+        # Swapped together, a message being checked keeps the old pair
+        self.filters, self.entry_of = filters, self._index(filters)
+
+    def __bool__(self) -> bool:
+        return bool(self.filters)
+
+    def __len__(self) -> int:
+        return len(self.filters)
+
+_cache = LRUCache(maxsize=settings.FILTER_CACHE_SIZE, ttl=settings.FILTER_CACHE_TTL)
+# Bumped on every invalidation so a load that raced with an admin change is not cached
+_generations: dict[int, int] = {}
+_loads = SingleFlight("filter_set")
+
+async def load_filter_set(chat_id: int) -> ChatFilterSet:
+    # Own session: the load is shared by concurrent updates and must not
+    # depend on the unit of work of one of them
+    async for session in get_session():
+        stmt = select(Filter).where(Filter.chat_id == chat_id, Filter.is_active == True).order_by(Filter.id)
+        result = await session.execute(stmt)
+        return ChatFilterSet(chat_id, result.scalars().all())
+
+async def get_filter_set(chat_id: int) -> ChatFilterSet:
+    filter_set = _cache.get(chat_id)
+    if filter_set is not None:
+        return filter_set
+
+    # Concurrent misses for a chat share one load; after an invalidation
+    # a new one is started instead of joining the outdated one
+    generation = _generations.get(chat_id, 0)
+    return await _loads.do((chat_id, generation), lambda: _load(chat_id, generation))
+
+async def _load(chat_id: int, generation: int) -> ChatFilterSet:
+    filter_set = await load_filter_set(chat_id)
+    # Keep the order learned before the reload
+    filter_set.reorder(filter_stats.get(chat_id))
+    if _generations.get(chat_id, 0) == generation:
+        _cache.set(chat_id, filter_set)
+    return filter_set
+
+async def migrate_smart_regex_filters() -> int:
+    """
+    Rewrites regex rows produced by generate_smart_regex into normalized
+    smart patterns. Safe to run on every startup.
+    """
+    migrated = 0
+    async for session in get_session():
+        stmt = select(Filter).where(Filter.filter_type == "regex")
+        result = await session.execute(stmt)
+        for f in result.scalars().all():
+            word = recover_smart_word(f.pattern) if f.pattern else None
+            if word is None:
+                continue
+            pattern = make_smart_pattern(word)
+            # Words made only of separators stay regexes
+            if parse_smart_pattern(pattern) is not None:
+                f.pattern = pattern
+                migrated += 1
+        if migrated:
+            await session.commit()
+    _cache.clear()
+    return migrated
+
+def _drop(chat_id: int):
+    _cache.pop(chat_id)
+    _generations[chat_id] = _generations.get(chat_id, 0) + 1
+
+def invalidate_filter_set(chat_id: int):
+    _drop(chat_id)
+    # Other instances drop their compiled copy too
+    bus.publish_soon("filters", str(chat_id))
+
+def _on_remote_invalidation(key: str | None):
+    if key is None:
+        _cache.clear()
+        for chat_id in list(_generations):
+            _generations[chat_id] += 1
+    else:
+        _drop(int(key))
+
+bus.subscribe("filters", _on_remote_invalidation)
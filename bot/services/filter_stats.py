@@ -0,0 +1,74 @@
+from bot.core.config import settings
+from bot.core.lru import LRUCache
+
+MIN_RUNS = 20 # Below this a filter is not measured well enough to be moved
+DECAY_RUNS = 10000 # Counters are halved past this, recent behaviour weighs more
+
+class FilterStat:
+    __slots__ = ("label", "runs", "hits", "seconds")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.runs = 0
+        self.hits = 0
+        self.seconds = 0.0
+
+    @property
+    def cost(self) -> float:
+        """Average seconds per run."""
+        return self.seconds / self.runs if self.runs else 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.runs if self.runs else 0.0
+
+    @property
+    def expected_cost(self) -> float:
+        # Checking filters by cost / probability of a hit minimizes the
+        # expected time to the first hit; smoothed so a filter that never
+        # hit yet is not pushed to infinity
+        return self.cost * (self.runs + 2) / (self.hits + 1)
+
+class FilterStats:
+    """
+    Running cost and hit counters of every filter, per chat and per process.
+    ChatFilterSet uses them to check cheap, often matching filters first.
+    """
+
+    def __init__(self, max_chats: int = 10000, reorder_every: int = 500):
+        self.reorder_every = reorder_every
+        self._chats = LRUCache(maxsize=max_chats)
+        self._messages = LRUCache(maxsize=max_chats)
+
+    def record(self, chat_id: int, key: str, label: str, seconds: float, hit: bool):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = {}
+            self._chats.set(chat_id, chat)
+        stat = chat.get(key)
+        if stat is None:
+            stat = chat[key] = FilterStat(label)
+
+        stat.runs += 1
+        stat.seconds += seconds
+        if hit:
+            stat.hits += 1
+        if stat.runs > DECAY_RUNS:
+            stat.runs //= 2
+            stat.hits //= 2
+            stat.seconds /= 2
+
+    def get(self, chat_id: int) -> dict[str, FilterStat]:
+        return self._chats.get(chat_id) or {}
+
+    def tick(self, chat_id: int) -> bool:
+        """Counts a moderated message, True when the chat's filters are due for reordering."""
+        count = self._messages.get(chat_id, 0) + 1
+        self._messages.set(chat_id, count % self.reorder_every)
+        return count >= self.reorder_every
+
+    def forget(self, chat_id: int):
+        self._chats.pop(chat_id)
+        self._messages.pop(chat_id)
+
+filter_stats = FilterStats(max_chats=settings.FILTER_STATS_MAX_CHATS, reorder_every=settings.FILTER_REORDER_EVERY)
@@ -1,49 +1,47 @@
 import re
 
-def check_regex(text: str, pattern: str) -> bool:
-    try:
-        return bool(re.search(pattern, text, re.IGNORECASE))
-    except re.error:
-        return False
-
-def check_link(text: str) -> bool:
-    # Simple link regex
-    url_pattern = r"(https?://[^\s]+)|(www\.[^\s]+)"
-    return bool(re.search(url_pattern, text))
-
-def check_caps(text: str, threshold: float = 0.7) -> bool:
-    if len(text) < 5:
-        return False
-    caps_count = sum(1 for c in text if c.isupper())
-    return (caps_count / len(text)) > threshold
-
-def check_keywords(text: str, keywords: list[str]) -> bool:
-    text_lower = text.lower()
-    for kw in keywords:
-        if kw.lower() in text_lower:
-            return True
-    return False
-
-def check_crypto(text: str) -> bool:
-    # Common crypto address patterns
-    patterns = [
-        r"\b(bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}\b", # BTC
-        r"\b0x[a-fA-F0-9]{40}\b", # ETH/BSC/Polygon
-        r"\bT[A-Za-z1-9]{33}\b" # TRX
-    ]
-    for p in patterns:
-        if re.search(p, text):
-            return True
-    return False
-
-def check_phone(text: str) -> bool:
-    # Simple phone regex (international format)
-    pattern = r"\+?[\d\s\-\(\)]{7,}"
-    # Refine to avoid false positives (requires at least 7 digits)
-    digits = re.sub(r"\D", "", text)
-    return len(digits) >= 7 and bool(re.search(pattern, text))
+# Features reported by classify()
+FEATURE_LINK = 1
+FEATURE_CRYPTO = 2
+FEATURE_PHONE = 4
+FEATURE_CAPS = 8
+
+CAPS_THRESHOLD = 0.7
+CAPS_MIN_LENGTH = 5
+
+_LINK = r"https?://\S+|www\.\S+"
+
+# Compiled once. Each detector scans the text on its own: a crypto address
+# or a phone number inside a link still has to be found.
+_LINK_RE = re.compile(_LINK)
+_CRYPTO_RE = re.compile(
+    r"\b(?:(?:bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}" # BTC
+    r"|0x[a-fA-F0-9]{40}" # ETH/BSC/Polygon
+    r"|T[A-Za-z1-9]{33})\b" # TRX
+)
+_PHONE_RE = re.compile(r"\+?\(?\d(?:[\s\-()]{0,3}\d){6,}") # At least 7 digits in the number itself
+
+def classify(text: str) -> int:
+    """
+    Returns a bitmask of FEATURE_* flags found in the text.
+    CAPS: more than CAPS_THRESHOLD of the text is upper case.
+    """
+    features = 0
+    if _LINK_RE.search(text):
+        features |= FEATURE_LINK
+    if _CRYPTO_RE.search(text):
+        features |= FEATURE_CRYPTO
+    if _PHONE_RE.search(text):
+        features |= FEATURE_PHONE
+
+    if len(text) >= CAPS_MIN_LENGTH and sum(map(str.isupper, text)) / len(text) > CAPS_THRESHOLD:
+        features |= FEATURE_CAPS
+    return features
+
+def find_links(text: str) -> list[str]:
+    # Fallback for texts that came without entities
+    return _LINK_RE.findall(text)
 
 def check_media(message) -> bool:
     # Check if message has media content (photo, video, document, etc.)
     return bool(message.photo or message.video or message.document or message.voice or message.audio)
-
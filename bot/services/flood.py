@@ -0,0 +1,106 @@
+import time
+from bot.core.config import settings
+from bot.core.redis import redis_client
+from bot.core.memory_cache import MemoryCache
+from bot.core.lru import LRUCache
+from bot.core.metrics import metrics
+
+# Flood filters store "N/T" (per user) or "N/T,M/S" (per user, whole chat) in Filter.pattern
+DEFAULT_USER_LIMIT = (5, 10)
+USER_LIMIT_OPTIONS = [(3, 10), (5, 10), (10, 30), (20, 60)]
+CHAT_LIMIT_OPTIONS = [None, (20, 10), (50, 10), (100, 30)]
+
+Limit = tuple[int, int] # (messages, seconds)
+
+def _parse_limit(value: str) -> Limit | None:
+    count, _, seconds = value.strip().partition("/")
+    try:
+        count, seconds = int(count), int(seconds)
+    except ValueError:
+        return None
+    if count <= 0 or seconds <= 0:
+        return None
+    return count, seconds
+
+def parse_flood_pattern(pattern: str | None) -> tuple[Limit, Limit | None]:
+    parts = (pattern or "").split(",")
+    user_limit = _parse_limit(parts[0]) or DEFAULT_USER_LIMIT
+    chat_limit = _parse_limit(parts[1]) if len(parts) > 1 else None
+    return user_limit, chat_limit
+
+def make_flood_pattern(user_limit: Limit, chat_limit: Limit | None) -> str:
+    pattern = f"{user_limit[0]}/{user_limit[1]}"
+    if chat_limit:
+        pattern += f",{chat_limit[0]}/{chat_limit[1]}"
+    return pattern
+
+def format_limit(limit: Limit | None) -> str:
+    return f"{limit[0]}/{limit[1]}с" if limit else "выкл"
+
+# Sliding window per key: drop old entries, add this message, count.
+# KEYS: windows, ARGV[1]: now (ms), ARGV[2]: member, ARGV[2 + i]: window of KEYS[i] (ms)
+SLIDING_WINDOW_LUA = """
+local counts = {}
+for i, key in ipairs(KEYS) do
+    local window = tonumber(ARGV[2 + i])
+    redis.call("ZREMRANGEBYSCORE", key, 0, tonumber(ARGV[1]) - window)
+    redis.call("ZADD", key, ARGV[1], ARGV[2])
+    redis.call("PEXPIRE", key, window)
+    counts[i] = redis.call("ZCARD", key)
+end
+return counts
+"""
+
+class FloodLimiter:
+    """
+    Counts messages per user and per chat. With Redis every message costs
+    one script call that trims and counts sorted set windows atomically;
+    on MemoryCache token buckets in process are used instead.
+    """
+
+    def __init__(self, redis, max_buckets: int = 100000):
+        self.redis = redis
+        self.local = isinstance(redis, MemoryCache)
+        self._script = None if self.local else redis.register_script(SLIDING_WINDOW_LUA)
+        # key -> [tokens, updated]
+        self._buckets = LRUCache(maxsize=max_buckets)
+
+    async def hit(self, chat_id: int, user_id: int, message_id: int, user_limit: Limit, chat_limit: Limit | None = None) -> bool:
+        """Records the message, True if it exceeds one of the limits."""
+        limits = [(f"flood:{chat_id}:{user_id}", user_limit)]
+        if chat_limit:
+            limits.append((f"flood:{chat_id}", chat_limit))
+
+        if self.local:
+            # Every bucket takes its token, so each one sees the whole rate
+            exceeded = [self._take(key, limit) for key, limit in limits]
+        else:
+            counts = await self._script(
+                keys=[key for key, _ in limits],
+                args=[int(time.time() * 1000), message_id] + [limit[1] * 1000 for _, limit in limits],
+            )
+            exceeded = [count > limit[0] for count, (_, limit) in zip(counts, limits)]
+
+        if any(exceeded):
+            metrics.incr("flood.exceeded")
+            return True
+        return False
+
+    def _take(self, key: str, limit: Limit) -> bool:
+        count, seconds = limit
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [count, now]
+        else:
+            bucket[0] = min(count, bucket[0] + (now - bucket[1]) * count / seconds)
+            bucket[1] = now
+        # Idle buckets are full again by then
+        self._buckets.set(key, bucket, ttl=seconds * 2)
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return False
+        return True
+
+flood_limiter = FloodLimiter(redis_client, max_buckets=settings.FLOOD_MAX_BUCKETS)
@@ -0,0 +1,98 @@
+from collections import deque
+from typing import Any, Iterable
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a fixed set of keywords.
+    Finds a keyword occurrence in a single linear pass over the text,
+    regardless of how many keywords there are.
+    Each keyword carries a payload which is returned on match.
+    """
+
+    def __init__(self, keywords: Iterable[str] = ()):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[Any] = [None]
+        self._size = 0
+        self._built = False
+
+        for kw in keywords:
+            self.add(kw)
+        self.build()
+
+    def add(self, keyword: str, payload: Any = True):
+        if not keyword or payload is None:
+            return
+
+        node = 0
+        for char in keyword:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+            node = nxt
+
+        # First payload wins for duplicate keywords
+        if self._out[node] is None:
+            self._out[node] = payload
+            self._size += 1
+        self._built = False
+
+    def build(self):
+        # BFS over the trie to compute failure links.
+        # A node inherits the output of its failure target, so a single
+        # lookup per position is enough to detect any keyword ending there.
+        queue = deque(self._goto[0].values())
+        for child in queue:
+            self._fail[child] = 0
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+
+                if self._out[child] is None:
+                    self._out[child] = self._out[self._fail[child]]
+
+        self._built = True
+
+    def search(self, text: str) -> Any:
+        """Returns the payload of the first keyword found in text, or None."""
+        if not self._size:
+            return None
+        if not self._built:
+            self.build()
+
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node] is not None:
+                return out[node]
+        return None
+
+    def __contains__(self, text: str) -> bool:
+        return self.search(text) is not None
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __len__(self) -> int:
+        return self._size
+
+def parse_keywords(pattern: str | None) -> list[str]:
+    # Comma separated list, case-insensitive, blanks are ignored
+    if not pattern:
+        return []
+    return [kw.strip().lower() for kw in pattern.split(",") if kw.strip()]
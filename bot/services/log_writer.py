@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import time
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError, InterfaceError, OperationalError
+from bot.core.config import settings
+from bot.core.database import get_session
+from bot.core.metrics import metrics
+from bot.core.models import Log
+
+class LogWriter:
+    """
+    Writes violation logs in the background. Handlers only enqueue a row;
+    rows are flushed with one multi-row INSERT when the batch is full or
+    the flush interval has passed. A batch with rows the database rejects
+    is split so only those are dropped; while the database is unreachable
+    the batch is kept and retried with backoff.
+    """
+
+    MAX_BACKOFF = 60 # Seconds
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._pending: list[dict] = []
+        self._task: asyncio.Task | None = None
+        self._last_warning = 0.0
+        self._outages = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the writer and flushes everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Rows of an interrupted flush are still pending
+        while not self._queue.empty():
+            self._pending.append(self._queue.get_nowait())
+        while self._pending:
+            if not await self._flush(self._pending[:self.batch_size]):
+                metrics.incr("log_writer.failed", len(self._pending))
+                logging.error(f"Database unreachable, {len(self._pending)} logs not written")
+                self._pending.clear()
+
+    def submit(self, chat_id: int, user_id: int, action: str, details: str) -> bool:
+        row = {"chat_id": chat_id, "user_id": user_id, "action": action, "details": details}
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            # Never block the message handler on the database
+            metrics.incr("log_writer.dropped")
+            self._warn_backpressure()
+            return False
+
+        depth = self._queue.qsize()
+        metrics.gauge("log_writer.queue_depth", depth)
+        if depth >= self._queue.maxsize * 0.8:
+            metrics.incr("log_writer.backpressure")
+            self._warn_backpressure()
+        return True
+
+    def _warn_backpressure(self):
+        now = time.monotonic()
+        if now - self._last_warning > 10:
+            self._last_warning = now
+            logging.warning(
+                f"Log writer under backpressure: {self._queue.qsize()}/{self._queue.maxsize} queued, "
+                f"{metrics.counters['log_writer.dropped']} dropped"
+            )
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                self._pending.append(await self._queue.get())
+
+            # Collect until the batch is full or the interval is over
+            deadline = loop.time() + self.flush_interval
+            while len(self._pending) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            if await self._flush(self._pending[:self.batch_size]):
+                self._outages = 0
+            else:
+                # Pending rows are kept, new ones wait in the queue meanwhile
+                self._outages += 1
+                await asyncio.sleep(min(self.flush_interval * 2 ** self._outages, self.MAX_BACKOFF))
+            metrics.gauge("log_writer.queue_depth", self._queue.qsize())
+
+    async def _flush(self, batch: list[dict]) -> bool:
+        """Writes a batch from the front of the pending rows, False if the database is unreachable."""
+        if not batch:
+            return True
+        try:
+            await self._insert(batch)
+        except (OperationalError, InterfaceError) as e:
+            metrics.incr("log_writer.retried")
+            logging.warning(f"Failed to write {len(batch)} logs, will retry: {e}")
+            return False
+        except Exception as e:
+            metrics.incr("log_writer.failed", len(batch))
+            logging.error(f"Failed to write {len(batch)} logs: {e}")
+            del self._pending[:len(batch)]
+        return True
+
+    async def _insert(self, batch: list[dict]):
+        # Rows are only forgotten once settled (even if cancelled before),
+        # batches are always taken from the front of the pending rows
+        try:
+            async for session in get_session():
+                await session.execute(insert(Log).values(batch))
+                await session.commit()
+        except (IntegrityError, DataError) as e:
+            if len(batch) == 1:
+                metrics.incr("log_writer.failed")
+                logging.error(f"Failed to write log of {batch[0]['chat_id']}: {e}")
+                del self._pending[:1]
+                return
+            # One bad row fails the whole INSERT, halve the batch until it is isolated
+            middle = len(batch) // 2
+            await self._insert(batch[:middle])
+            await self._insert(batch[middle:])
+            return
+        metrics.incr("log_writer.written", len(batch))
+        del self._pending[:len(batch)]
+
+log_writer = LogWriter(
+    max_queue=settings.LOG_QUEUE_SIZE,
+    batch_size=settings.LOG_BATCH_SIZE,
+    flush_interval=settings.LOG_FLUSH_INTERVAL,
+)
@@ -1,104 +1,252 @@
-from sqlalchemy import select
-from bot.core.database import get_session
-from bot.core.models import Filter, Log
-from bot.services.filters import check_regex, check_link, check_caps, check_keywords
-from bot.services.punishment import delete_message, mute_user, ban_user
+import hashlib
+import time
+from functools import cached_property
+from bot.core.config import settings
+from bot.core.database import LazySession
+from bot.services.filters import FEATURE_LINK, FEATURE_CAPS, FEATURE_CRYPTO, FEATURE_PHONE, classify, find_links, check_media
+from bot.services.domains import DomainRules, host_of
+from bot.services.filter_set import ChatFilterSet, CompiledFilter, RegexGroup, SmartGroup, get_filter_set
+from bot.services.normalizer import normalize
+from bot.services.near_duplicates import Fingerprint, fingerprint, near_duplicates
+from bot.services.flood import flood_limiter
+from bot.services.regex_guard import sandboxed_search
+from bot.services.log_writer import log_writer
+from bot.services.punishment import delete_message, purge_messages, mute_user, ban_user
+from bot.services.recent_messages import recent_messages
+from bot.services.verdicts import CLEAN, CONTENT_TYPES, verdicts
+from bot.services.filter_stats import filter_stats
 from aiogram import Bot
 from aiogram.types import Message
 
-async def moderate_message(bot: Bot, message: Message):
-    # if not message.text and not message.caption:
-    #    return
+# Entities Telegram has already parsed for us, text_link carries its url
+_ENTITY_TYPES = {"url", "text_link", "mention", "phone_number", "cashtag"}
+
+class MessageContext:
+    """Per-message values shared by all filters, each computed at most once."""
+
+    def __init__(self, message: Message):
+        self.message = message
+        self.text = message.text or message.caption or ""
+        # Seconds left for sandboxed regexes, shared by all of them
+        self.regex_budget = settings.REGEX_TIMEOUT_MS / 1000
+
+    @cached_property
+    def text_lower(self) -> str:
+        return self.text.lower()
+
+    @cached_property
+    def text_normalized(self) -> str:
+        return normalize(self.text)
+
+    @cached_property
+    def features(self) -> int:
+        # One scan for all built-in text filters (links, caps, crypto, phones)
+        return classify(self.text)
+
+    @cached_property
+    def entities(self) -> dict[str, list[str]] | None:
+        """Values of the parsed entities by type, None if the text came without entities."""
+        entities = self.message.entities or self.message.caption_entities
+        if entities is None:
+            return None
+        parsed = {}
+        for entity in entities:
+            if entity.type not in _ENTITY_TYPES:
+                continue
+            value = entity.url if entity.type == "text_link" else entity.extract_from(self.text)
+            parsed.setdefault(entity.type, []).append(value)
+        return parsed
+
+    @cached_property
+    def links(self) -> list[str]:
+        if self.entities is not None:
+            # Telegram's parser also finds bare domains and hidden hyperlinks
+            return self.entities.get("url", []) + self.entities.get("text_link", [])
+        return find_links(self.text) if self.features & FEATURE_LINK else []
+
+    @property
+    def has_phone(self) -> bool:
+        # Not every number format is parsed by Telegram, the scan still runs without an entity
+        if self.entities and "phone_number" in self.entities:
+            return True
+        return bool(self.features & FEATURE_PHONE)
+
+    @property
+    def has_crypto(self) -> bool:
+        if self.entities and "cashtag" in self.entities:
+            return True
+        return bool(self.features & FEATURE_CRYPTO)
+
+    @cached_property
+    def content_hash(self) -> bytes:
+        # Everything content filters look at: the exact text (caps and regexes
+        # see case and spacing), parsed entities and what is attached
+        digest = hashlib.blake2b(self.text.encode(), digest_size=16)
+        if self.entities is not None:
+            digest.update(repr(sorted(self.entities.items())).encode())
+        digest.update(b"\0c" if self.message.contact else b"\0")
+        digest.update(b"\0m" if check_media(self.message) else b"\0")
+        return digest.digest()
+
+    @cached_property
+    def fingerprint(self) -> Fingerprint:
+        return fingerprint(self.message, self.text)
+
+async def match_filter(f: CompiledFilter | RegexGroup | SmartGroup, ctx: MessageContext) -> CompiledFilter | None:
+    # Returns the filter row that matched, a group may report any of its members
+    if isinstance(f, RegexGroup):
+        return f.search(ctx.text)
+    if isinstance(f, SmartGroup):
+        return f.search(ctx.text_normalized)
+    if await check_filter(f, ctx):
+        return f
+    return None
+
+def has_blocked_link(ctx: MessageContext, domains: DomainRules | None) -> bool:
+    # Without domain rules every link is blocked
+    for link in ctx.links:
+        if domains is None or domains.is_blocked(host_of(link)):
+            return True
+    # @mentions count as t.me links once t.me is denied explicitly
+    if domains and ctx.entities and "mention" in ctx.entities:
+        return domains.lookup("t.me") is False
+    return False
+
+async def check_filter(f: CompiledFilter, ctx: MessageContext) -> bool:
+    message = ctx.message
+    text = ctx.text
+    chat_id = message.chat.id
+
+    if f.filter_type == "regex":
+        if f.sandboxed:
+            found, ctx.regex_budget = await sandboxed_search(f, chat_id, text, ctx.regex_budget)
+            return found
+        return bool(f.regex.search(text))
+    elif f.filter_type == "link":
+        return has_blocked_link(ctx, f.domains)
+    elif f.filter_type == "caps":
+        return bool(ctx.features & FEATURE_CAPS)
+    elif f.filter_type in ("keywords", "mat"):
+        return f.matcher.search(ctx.text_lower) is not None
+    elif f.filter_type == "crypto":
+        return ctx.has_crypto
+    elif f.filter_type == "contacts":
+        return bool(message.contact) or ctx.has_phone
+    elif f.filter_type == "media":
+        return check_media(message)
+    elif f.filter_type == "channels":
+        # Check if message is sent on behalf of a channel
+        if message.sender_chat:
+            # Allow if it's the chat itself (official posts)
+            if message.sender_chat.id != chat_id:
+                # Allow if it's an automatic forward (linked channel)
+                if not message.is_automatic_forward:
+                    return True
+        return False
+    elif f.filter_type == "flood":
+        return await flood_limiter.hit(chat_id, message.from_user.id, message.message_id, f.user_limit, f.chat_limit)
+    elif f.filter_type == "repeats":
+        # Near copies (SimHash) of messages posted within the timer window,
+        # by the same user or by several users
+        return near_duplicates.check(chat_id, message.from_user.id, ctx.fingerprint, f.timer)
 
-    text = message.text or message.caption or ""
+    return False
+
+async def judge(filter_set: ChatFilterSet, ctx: MessageContext, stateful: bool = True) -> CompiledFilter | None:
+    """First filter the message violates. stateful=False runs content filters only."""
+    chat_id = ctx.message.chat.id
+
+    # Same text seen before under the same filters: content filters are not run again
+    cached = verdicts.get(ctx.content_hash, filter_set.version)
+    # Order as of now, filters may get reordered while this message is checked
+    filters, entry_of = filter_set.filters, filter_set.entry_of
+    hit = None
+    for i, f in enumerate(filters):
+        if f.filter_type in CONTENT_TYPES:
+            if cached is not None:
+                if cached != CLEAN and entry_of[cached] == i:
+                    hit = filter_set.compiled[cached]
+                    break
+                continue
+        elif not stateful:
+            continue
+        started = time.perf_counter()
+        hit = await match_filter(f, ctx)
+        filter_stats.record(chat_id, f.stat_key, f.label, time.perf_counter() - started, hit is not None)
+        if hit:
+            break
+
+    if filter_stats.tick(chat_id):
+        filter_set.reorder(filter_stats.get(chat_id))
+
+    # Cacheable if every content filter before the hit ran to the end (no regex timeout)
+    if cached is None and (hit is None or hit.filter_type in CONTENT_TYPES) and ctx.regex_budget > 0:
+        verdicts.set(ctx.content_hash, filter_set.version, CLEAN if hit is None else filter_set.compiled.index(hit))
+    return hit
+
+async def punish(bot: Bot, message: Message, hit: CompiledFilter, message_ids: list[int]):
     chat_id = message.chat.id
     user_id = message.from_user.id
+    action = hit.action
+
+    # Execute punishment
+    if action == "delete":
+        await purge_messages(bot, chat_id, message_ids)
+    elif action == "mute":
+        # Also remove the user's previous messages (includes these ones)
+        await purge_messages(bot, chat_id, recent_messages.pop(chat_id, user_id) + message_ids)
+        await mute_user(bot, chat_id, user_id)
+    elif action == "ban":
+        await purge_messages(bot, chat_id, recent_messages.pop(chat_id, user_id) + message_ids)
+        await ban_user(bot, chat_id, user_id)
+
+    # Log violation, written in batches by the background writer
+    log_writer.submit(chat_id, user_id, action, f"Violation: {hit.filter_type}")
+
+async def moderate_message(bot: Bot, message: Message, db: LazySession | None = None):
+    await moderate_batch(bot, [message], db)
+
+async def moderate_batch(bot: Bot, messages: list[Message], db: LazySession | None = None):
+    """
+    Moderates messages in units: the items of an album (same media_group_id)
+    share one verdict, one batched delete, one punishment and one log row,
+    other messages are units of their own. Also suits replaying stored messages.
+    """
+    # Outside of an update (no shared session) run in a unit of work of our own
+    if db is None:
+        async with LazySession() as own_db:
+            return await moderate_batch(bot, messages, own_db)
+
+    units: dict[tuple, list[Message]] = {}
+    for message in messages:
+        key = (message.chat.id, message.media_group_id or message.message_id)
+        units.setdefault(key, []).append(message)
+
+    for unit in units.values():
+        await moderate_unit(bot, unit, db)
+
+async def moderate_unit(bot: Bot, unit: list[Message], db: LazySession):
+    # if not message.text and not message.caption:
+    #    return
+
+    first = unit[0]
+    chat_id = first.chat.id
+    user_id = first.from_user.id
+
+    # Compiled filters are cached per chat, no DB round trip on the hot path
+    filter_set = await get_filter_set(chat_id)
+    if not filter_set:
+        return
+
+    for message in unit:
+        recent_messages.record(chat_id, user_id, message.message_id)
+
+    hit = None
+    for n, message in enumerate(unit):
+        # Flood, repeats and channels count an album once, on its first item
+        hit = await judge(filter_set, MessageContext(message), stateful=n == 0)
+        if hit:
+            break
 
-    async for session in get_session():
-        # Fetch active filters for this chat
-        stmt = select(Filter).where(Filter.chat_id == chat_id, Filter.is_active == True)
-        result = await session.execute(stmt)
-        filters = result.scalars().all()
-
-        violation = None
-        action = "delete"
-
-        for f in filters:
-            is_violation = False
-            if f.filter_type == "regex" and f.pattern:
-                is_violation = check_regex(text, f.pattern)
-            elif f.filter_type == "link":
-                is_violation = check_link(text)
-            elif f.filter_type == "caps":
-                is_violation = check_caps(text)
-            elif f.filter_type == "keywords" and f.pattern:
-                is_violation = check_keywords(text, f.pattern.split(","))
-            elif f.filter_type == "mat" and f.pattern:
-                is_violation = check_keywords(text, f.pattern.split(","))
-            elif f.filter_type == "crypto":
-                from bot.services.filters import check_crypto
-                is_violation = check_crypto(text)
-            elif f.filter_type == "contacts":
-                from bot.services.filters import check_phone
-                if message.contact:
-                    is_violation = True
-                else:
-                    is_violation = check_phone(text)
-            elif f.filter_type == "media":
-                from bot.services.filters import check_media
-                is_violation = check_media(message)
-            elif f.filter_type == "channels":
-                # Check if message is sent on behalf of a channel
-                if message.sender_chat:
-                    # Allow if it's the chat itself (official posts)
-                    if message.sender_chat.id != chat_id:
-                        # Allow if it's an automatic forward (linked channel)
-                        if not message.is_automatic_forward:
-                            is_violation = True
-            elif f.filter_type == "repeats":
-                # Check for duplicate messages
-                from bot.core.redis import redis_client
-                import hashlib
-                
-                # Create a hash of the content
-                content = text
-                if message.photo: content += f"photo:{message.photo[-1].file_unique_id}"
-                if message.video: content += f"video:{message.video.file_unique_id}"
-                if message.document: content += f"doc:{message.document.file_unique_id}"
-                
-                msg_hash = hashlib.md5(content.encode()).hexdigest()
-                key = f"last_msg:{chat_id}:{user_id}"
-                
-                last_hash = await redis_client.get(key)
-                if last_hash == msg_hash:
-                    is_violation = True
-                
-                # Get timer from pattern (default 60)
-                try:
-                    timer = int(f.pattern)
-                except (ValueError, TypeError):
-                    timer = 60
-
-                # Save current hash
-                await redis_client.set(key, msg_hash, ex=timer)
-
-            if is_violation:
-                violation = f.filter_type
-                action = f.action
-                break
-        
-        if violation:
-            # Execute punishment
-            if action == "delete":
-                await delete_message(bot, chat_id, message.message_id)
-            elif action == "mute":
-                await delete_message(bot, chat_id, message.message_id)
-                await mute_user(bot, chat_id, user_id)
-            elif action == "ban":
-                await delete_message(bot, chat_id, message.message_id)
-                await ban_user(bot, chat_id, user_id)
-
-            # Log violation
-            log = Log(chat_id=chat_id, user_id=user_id, action=action, details=f"Violation: {violation}")
-            session.add(log)
-            await session.commit()
+    if hit:
+        await punish(bot, first, hit, [m.message_id for m in unit])
@@ -0,0 +1,102 @@
+import hashlib
+import time
+from collections import deque
+from aiogram.types import Message
+from bot.core.config import settings
+from bot.core.lru import LRUCache
+from bot.core.metrics import metrics
+from bot.services.normalizer import normalize
+
+SHINGLE_SIZE = 4
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash over character shingles: similar texts get fingerprints
+    that differ in a few bits only.
+    """
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+    bits = [format(_hash64(s), "064b") for s in shingles]
+    # Majority vote per bit position, columns are counted in C
+    half = len(bits) / 2
+    return int("".join("1" if column.count("1") > half else "0" for column in map("".join, zip(*bits))), 2)
+
+class Fingerprint:
+    __slots__ = ("value", "exact", "shared")
+
+    def __init__(self, value: int, exact: bool, shared: bool):
+        self.value = value
+        # Short texts are compared exactly, SimHash is too noisy on them
+        self.exact = exact
+        # Whether copies by other users count (not for short texts like "ok")
+        self.shared = shared
+
+def fingerprint(message: Message, text: str, min_length: int = settings.REPEATS_MIN_LENGTH) -> Fingerprint:
+    # Homoglyphs, case, separators and emoji do not make a message different
+    content = normalize(text)
+    media = []
+    if message.photo: media.append(f"photo:{message.photo[-1].file_unique_id}")
+    if message.video: media.append(f"video:{message.video.file_unique_id}")
+    if message.document: media.append(f"doc:{message.document.file_unique_id}")
+
+    if len(content) >= min_length:
+        value = simhash(content)
+        if media:
+            # Same text with another attachment is another message
+            value ^= _hash64("|".join(media))
+        return Fingerprint(value, exact=False, shared=True)
+    return Fingerprint(_hash64(content + "|".join(media)), exact=True, shared=bool(media))
+
+class NearDuplicateIndex:
+    """
+    Fingerprints of the recent messages of each chat. A message repeats if
+    the same user posted a near copy within the window, or if enough
+    different users did (the same spam from several accounts).
+    Kept in memory: updates of a chat are handled by one instance.
+    """
+
+    def __init__(self, window_size: int = 200, max_chats: int = 10000, max_distance: int = 10, cross_user_min: int = 3):
+        self.window_size = window_size
+        self.max_distance = max_distance
+        self.cross_user_min = cross_user_min
+        self._chats = LRUCache(maxsize=max_chats)
+
+    def check(self, chat_id: int, user_id: int, fp: Fingerprint, window: float) -> bool:
+        """Records the message and returns True if it repeats one in the window."""
+        entries = self._chats.get(chat_id)
+        if entries is None:
+            entries = deque(maxlen=self.window_size)
+            self._chats.set(chat_id, entries)
+
+        now = time.monotonic()
+        same_user = False
+        users = set()
+        for timestamp, value, exact, author in reversed(entries):
+            if now - timestamp > window:
+                break
+            if exact != fp.exact:
+                continue
+            if (value == fp.value) if exact else ((value ^ fp.value).bit_count() <= self.max_distance):
+                if author == user_id:
+                    same_user = True
+                    break
+                users.add(author)
+
+        entries.append((now, fp.value, fp.exact, user_id))
+
+        if same_user:
+            metrics.incr("repeats.same_user")
+            return True
+        if fp.shared and self.cross_user_min and len(users) + 1 >= self.cross_user_min:
+            metrics.incr("repeats.cross_user")
+            return True
+        return False
+
+near_duplicates = NearDuplicateIndex(
+    window_size=settings.REPEATS_WINDOW_SIZE,
+    max_chats=settings.REPEATS_MAX_CHATS,
+    max_distance=settings.REPEATS_MAX_DISTANCE,
+    cross_user_min=settings.REPEATS_CROSS_USER_MIN,
+)
@@ -0,0 +1,89 @@
+from itertools import islice, product
+from bot.services.regex_generator import CHAR_MAP
+
+# Smart filters are stored as "smart:<normalized word>" in Filter.pattern
+SMART_PREFIX = "smart:"
+
+# A smart word is expanded into at most this many spellings
+MAX_VARIANTS = 64
+
+def _owners() -> dict[str, frozenset[str]]:
+    # Latin letters each look-alike in CHAR_MAP stands for
+    owners: dict[str, set[str]] = {}
+    for char, char_class in CHAR_MAP.items():
+        if not "a" <= char <= "z":
+            continue
+        for other in char_class.strip("[]"):
+            if other != char and not "a" <= other <= "z":
+                owners.setdefault(other, set()).add(char)
+    return {c: frozenset(letters) for c, letters in owners.items()}
+
+def _build_fold_map() -> tuple[dict[str, str], dict[str, str]]:
+    # Every character is folded to the one latin letter whose CHAR_MAP class
+    # it belongs to. Classes are not merged: latin letters stay themselves.
+    # A look-alike claimed by two letters (3 for e and z; 1, ! and | for i
+    # and l) is folded to one shared character instead, which smart words
+    # are expanded to (see smart_variants). Returns the fold map and the
+    # alternatives of every letter and shared character.
+    fold = {}
+    shared: dict[frozenset[str], list[str]] = {}
+    for c, letters in _owners().items():
+        if len(letters) == 1:
+            fold[c] = next(iter(letters))
+        else:
+            shared.setdefault(letters, []).append(c)
+
+    alternatives: dict[str, str] = {}
+    for letters, chars in shared.items():
+        rep = min(chars, key=lambda c: (not c.isdigit(), c))
+        for c in chars:
+            if c != rep:
+                fold[c] = rep
+        alternatives[rep] = rep + "".join(sorted(letters))
+        for letter in letters:
+            alternatives[letter] = alternatives.get(letter, letter) + rep
+    return fold, alternatives
+
+def _build_table() -> dict[int, str | None]:
+    table: dict[int, str | None] = {}
+
+    # Separators: everything that is not a letter or a digit is dropped,
+    # punctuation look-alikes are folded below instead.
+    # Covers the BMP and the emoji/symbol planes.
+    for start, end in ((0, 0x10000), (0x1F000, 0x1FC00)):
+        for code in range(start, end):
+            if not chr(code).isalnum():
+                table[code] = None
+
+    # Homoglyphs and leetspeak, applied after lowercasing
+    for char, rep in _FOLD_MAP.items():
+        table[ord(char)] = rep
+    return table
+
+_FOLD_MAP, _ALTERNATIVES = _build_fold_map()
+FOLD_TABLE = _build_table()
+
+def normalize(text: str) -> str:
+    """
+    Folds a text for smart matching: lowercase, Latin/Cyrillic homoglyphs
+    and leetspeak mapped to one form, separators removed.
+    """
+    return text.lower().translate(FOLD_TABLE)
+
+def smart_variants(word: str) -> list[str]:
+    """
+    Spellings of a normalized word with the shared look-alikes: "free" is
+    also "fr3e", "fre3" and "fr33". Bounded by MAX_VARIANTS, the word itself
+    comes first.
+    """
+    choices = [_ALTERNATIVES.get(c, c) for c in word]
+    return ["".join(chars) for chars in islice(product(*choices), MAX_VARIANTS)]
+
+def make_smart_pattern(word: str) -> str:
+    return SMART_PREFIX + normalize(word)
+
+def parse_smart_pattern(pattern: str | None) -> str | None:
+    """Returns the normalized word of a smart filter pattern, None for other patterns."""
+    if pattern and pattern.startswith(SMART_PREFIX):
+        return pattern[len(SMART_PREFIX):] or None
+    return None
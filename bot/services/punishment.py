@@ -1,23 +1,241 @@
+import asyncio
+import logging
+import time
 from aiogram import Bot
 from aiogram.types import ChatPermissions
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter, TelegramNetworkError, TelegramServerError
 from datetime import timedelta, datetime
+from bot.core.config import settings
+from bot.core.lru import LRUCache
+from bot.core.metrics import metrics
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # Set when Telegram answers with retry_after
+        self.blocked_until = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            wait = self.blocked_until - now
+            if wait <= 0 and self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(max(wait, (1 - self.tokens) / self.rate))
+
+    def reserve(self) -> float:
+        """Takes a token without waiting, returns the seconds until it may be used."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Tokens go negative, later reservations line up behind this one
+        self.tokens -= 1
+        return max(self.blocked_for(), -self.tokens / self.rate)
+
+    def blocked_for(self) -> float:
+        return max(0.0, self.blocked_until - time.monotonic())
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class PunishmentJob:
+    __slots__ = ("kind", "bot", "chat_id", "target", "duration_minutes", "attempts", "reserved")
+
+    def __init__(self, kind: str, bot: Bot, chat_id: int, target: int | tuple, duration_minutes: int = 60):
+        self.kind = kind
+        self.bot = bot
+        self.chat_id = chat_id
+        self.target = target # message_id for deletes, tuple of ids for purges, user_id otherwise
+        self.duration_minutes = duration_minutes
+        self.attempts = 0
+        self.reserved = False # Holds a chat token, set while waiting for its turn
+
+class PunishmentDispatcher:
+    """
+    Executes Telegram punishment calls from a bounded queue.
+    Calls go through a global and a per-chat token bucket, honor retry_after,
+    retry transient errors and coalesce duplicate mutes/bans of the same user.
+    Jobs of a chat that has to wait are set aside, workers never sleep on it.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queue: int = 5000,
+        global_rate: float = 25,
+        chat_rate: float = 3,
+        chat_burst: int = 10,
+        dedupe_window: float = 10,
+        max_retries: int = 3,
+    ):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = LRUCache(maxsize=10000)
+        self._recent = LRUCache(maxsize=50000, ttl=dedupe_window)
+        self._tasks: list[asyncio.Task] = []
+        self._retries: set[asyncio.Task] = set()
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 5):
+        """Gives queued punishments a chance to finish, then stops the workers."""
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Punishment queue not drained, {self._queue.qsize()} left, {len(self._retries)} retries pending")
+        for task in (*self._retries, *self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._retries, *self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _drain(self):
+        # A processed job may schedule a retry, which puts it back on the queue
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.gather(*self._retries, return_exceptions=True)
+
+    def submit(self, kind: str, bot: Bot, chat_id: int, target: int | tuple, duration_minutes: int = 60) -> bool:
+        self.start()
+
+        # Same punishment for the same target within the window is a no-op
+        key = (kind, chat_id, target)
+        if key in self._recent:
+            metrics.incr("punishments.coalesced")
+            return False
+
+        # A dropped job is not remembered, so the next attempt is not coalesced away
+        if not self._enqueue(PunishmentJob(kind, bot, chat_id, target, duration_minutes)):
+            return False
+        self._recent.set(key, True)
+        return True
+
+    def _enqueue(self, job: PunishmentJob) -> bool:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            metrics.incr("punishments.dropped")
+            logging.warning(f"Punishment queue full, dropped {job.kind} in {job.chat_id}")
+            return False
+        metrics.gauge("punishments.queue_depth", self._queue.qsize())
+        return True
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats.set(chat_id, bucket)
+        return bucket
+
+    def _retry_later(self, job: PunishmentJob, delay: float):
+        # A task rather than a loop timer, so stop() waits for pending retries
+        task = asyncio.create_task(self._enqueue_later(job, delay))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    async def _enqueue_later(self, job: PunishmentJob, delay: float):
+        await asyncio.sleep(delay)
+        self._enqueue(job)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            except Exception as e:
+                metrics.incr("punishments.failed")
+                logging.error(f"Punishment {job.kind} in {job.chat_id} failed: {e}")
+            finally:
+                self._queue.task_done()
+                metrics.gauge("punishments.queue_depth", self._queue.qsize())
+
+    async def _process(self, job: PunishmentJob):
+        # A chat over its rate or under retry_after must not hold up the
+        # workers: the job is put aside until its turn instead
+        chat_bucket = self._chat_bucket(job.chat_id)
+        wait = chat_bucket.blocked_for() if job.reserved else chat_bucket.reserve()
+        if wait > 0:
+            job.reserved = True
+            metrics.incr("punishments.deferred")
+            self._retry_later(job, wait)
+            return
+        job.reserved = False
+        await self._global.acquire()
+
+        job.attempts += 1
+        try:
+            await execute(job)
+            metrics.incr("punishments.done")
+        except TelegramBadRequest as e:
+            # The message was already deleted, by an admin or by another worker
+            if job.kind in ("delete", "purge") and "not found" in e.message.lower():
+                metrics.incr("punishments.already_done")
+                logging.debug(f"Punishment {job.kind} in {job.chat_id} skipped: {e.message}")
+                return
+            raise
+        except TelegramRetryAfter as e:
+            # Flood control: pause the chat and try again after retry_after
+            chat_bucket.block(e.retry_after)
+            metrics.incr("punishments.retry_after")
+            job.reserved = True
+            self._retry_later(job, e.retry_after)
+        except (TelegramNetworkError, TelegramServerError):
+            if job.attempts > self.max_retries:
+                raise
+            metrics.incr("punishments.retried")
+            self._retry_later(job, 2 ** job.attempts)
+
+async def execute(job: PunishmentJob):
+    if job.kind == "delete":
+        await job.bot.delete_message(job.chat_id, job.target)
+    elif job.kind == "purge":
+        await job.bot.delete_messages(job.chat_id, list(job.target))
+    elif job.kind == "mute":
+        until_date = datetime.now() + timedelta(minutes=job.duration_minutes)
+        permissions = ChatPermissions(can_send_messages=False)
+        await job.bot.restrict_chat_member(job.chat_id, job.target, permissions, until_date=until_date)
+    elif job.kind == "ban":
+        await job.bot.ban_chat_member(job.chat_id, job.target)
+
+dispatcher = PunishmentDispatcher(
+    workers=settings.PUNISH_WORKERS,
+    max_queue=settings.PUNISH_QUEUE_SIZE,
+    global_rate=settings.PUNISH_GLOBAL_RATE,
+    chat_rate=settings.PUNISH_CHAT_RATE,
+    chat_burst=settings.PUNISH_CHAT_BURST,
+    dedupe_window=settings.PUNISH_DEDUPE_WINDOW,
+)
 
 async def delete_message(bot: Bot, chat_id: int, message_id: int):
-    try:
-        await bot.delete_message(chat_id, message_id)
-    except Exception:
-        pass
+    dispatcher.submit("delete", bot, chat_id, message_id)
+
+# Telegram accepts at most 100 ids per deleteMessages call
+PURGE_BATCH_SIZE = 100
+
+async def purge_messages(bot: Bot, chat_id: int, message_ids: list[int]):
+    if len(message_ids) == 1:
+        return await delete_message(bot, chat_id, message_ids[0])
+
+    ids = sorted(set(message_ids))
+    for i in range(0, len(ids), PURGE_BATCH_SIZE):
+        dispatcher.submit("purge", bot, chat_id, tuple(ids[i:i + PURGE_BATCH_SIZE]))
 
 async def mute_user(bot: Bot, chat_id: int, user_id: int, duration_minutes: int = 60):
-    until_date = datetime.now() + timedelta(minutes=duration_minutes)
-    permissions = ChatPermissions(can_send_messages=False)
-    try:
-        await bot.restrict_chat_member(chat_id, user_id, permissions, until_date=until_date)
-    except Exception:
-        pass
+    dispatcher.submit("mute", bot, chat_id, user_id, duration_minutes)
 
 async def ban_user(bot: Bot, chat_id: int, user_id: int):
-    try:
-        await bot.ban_chat_member(chat_id, user_id)
-    except Exception as e:
-        print(f"Failed to ban user {user_id} in {chat_id}: {e}")
+    dispatcher.submit("ban", bot, chat_id, user_id)
@@ -0,0 +1,30 @@
+from collections import deque
+from bot.core.config import settings
+from bot.core.lru import LRUCache
+
+class RecentMessages:
+    """
+    Ring buffer of the last message ids per (chat, user), so a spammer's
+    earlier messages can be purged together when they are muted or banned.
+    Buffers of inactive users expire after the TTL.
+    """
+
+    def __init__(self, size: int = 20, ttl: float = 600, max_users: int = 100000):
+        self.size = size
+        self.ttl = ttl
+        self._buffers = LRUCache(maxsize=max_users, ttl=ttl)
+
+    def record(self, chat_id: int, user_id: int, message_id: int):
+        key = (chat_id, user_id)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = deque(maxlen=self.size)
+        buffer.append(message_id)
+        # Re-set to extend the TTL while the user is active
+        self._buffers.set(key, buffer)
+
+    def pop(self, chat_id: int, user_id: int) -> list[int]:
+        buffer = self._buffers.pop((chat_id, user_id))
+        return list(buffer) if buffer else []
+
+recent_messages = RecentMessages(size=settings.RECENT_MESSAGES_SIZE, ttl=settings.RECENT_MESSAGES_TTL)
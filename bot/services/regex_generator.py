@@ -1,5 +1,36 @@
 import re
 
+# Map of characters to their regex character class including lookalikes
+CHAR_MAP = {
+    'a': '[aа@4]', 'а': '[aа@4]',
+    'b': '[bв6]', 'в': '[bв6]',
+    'c': '[cсk]', 'с': '[cсk]', 'k': '[kкc]', 'к': '[kкc]',
+    'd': '[dд]', 'д': '[dд]',
+    'e': '[eе3]', 'е': '[eе3]',
+    'f': '[fф]', 'ф': '[fф]',
+    'g': '[gjg]',
+    'h': '[hн]', 'н': '[hн]',
+    'i': '[i1!|]', 
+    'l': '[l1!|]',
+    'm': '[mм]', 'м': '[mм]',
+    'n': '[nп]', 'п': '[nп]',
+    'o': '[oо0]', 'о': '[oо0]',
+    'p': '[pр]', 'р': '[pр]',
+    'r': '[rг]', 'г': '[rг]',
+    's': '[s$5]',
+    't': '[tт7]', 'т': '[tт7]',
+    'u': '[uи]', 'и': '[uи]',
+    'v': '[v]',
+    'w': '[wш]', 'ш': '[wш]',
+    'x': '[xх]', 'х': '[xх]',
+    'y': '[yу]', 'у': '[yу]',
+    'z': '[z3]',
+    # Add more as needed
+}
+
+# Flexible separator placed between characters of a generated pattern
+SEPARATOR = r"\s*[\W_]*\s*"
+
 def generate_smart_regex(word: str) -> str:
     """
     Generates a robust regex pattern for a given word, handling:
@@ -9,43 +40,40 @@ def generate_smart_regex(word: str) -> str:
     - Latin/Cyrillic homoglyphs
     """
     
-    # Map of characters to their regex character class including lookalikes
-    char_map = {
-        'a': '[aа@4]', 'а': '[aа@4]',
-        'b': '[bв6]', 'в': '[bв6]',
-        'c': '[cсk]', 'с': '[cсk]', 'k': '[kкc]', 'к': '[kкc]',
-        'd': '[dд]', 'д': '[dд]',
-        'e': '[eе3]', 'е': '[eе3]',
-        'f': '[fф]', 'ф': '[fф]',
-        'g': '[gjg]',
-        'h': '[hн]', 'н': '[hн]',
-        'i': '[i1!|]', 
-        'l': '[l1!|]',
-        'm': '[mм]', 'м': '[mм]',
-        'n': '[nп]', 'п': '[nп]',
-        'o': '[oо0]', 'о': '[oо0]',
-        'p': '[pр]', 'р': '[pр]',
-        'r': '[rг]', 'г': '[rг]',
-        's': '[s$5]',
-        't': '[tт7]', 'т': '[tт7]',
-        'u': '[uи]', 'и': '[uи]',
-        'v': '[v]',
-        'w': '[wш]', 'ш': '[wш]',
-        'x': '[xх]', 'х': '[xх]',
-        'y': '[yу]', 'у': '[yу]',
-        'z': '[z3]',
-        # Add more as needed
-    }
-
     pattern = ""
     for i, char in enumerate(word.lower()):
         # Get the character class or escape the character if it's special
-        char_class = char_map.get(char, re.escape(char))
+        char_class = CHAR_MAP.get(char, re.escape(char))
         
         pattern += char_class
         
         # Add flexible separator after each character except the last one
         if i < len(word) - 1:
-            pattern += r"\s*[\W_]*\s*"
+            pattern += SEPARATOR
 
     return pattern
+
+def recover_smart_word(pattern: str) -> str | None:
+    """
+    Reverses generate_smart_regex: returns the word a pattern was generated from,
+    or None if the pattern was written by hand.
+    """
+    classes = {}
+    for char, char_class in CHAR_MAP.items():
+        classes.setdefault(char_class, char)
+
+    word = ""
+    for piece in pattern.split(SEPARATOR):
+        if piece in classes:
+            word += classes[piece]
+        elif len(piece) == 1:
+            word += piece
+        elif len(piece) == 2 and piece[0] == "\\":
+            word += piece[1]
+        else:
+            return None
+
+    # Only accept exact round trips
+    if not word or generate_smart_regex(word) != pattern:
+        return None
+    return word
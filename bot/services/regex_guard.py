@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from sqlalchemy import update
+from bot.core.config import settings
+from bot.core.database import get_session
+from bot.core.metrics import metrics
+from bot.core.models import Filter
+from bot.core.redis import redis_client
+from bot.core.regex_sandbox import RegexSandbox
+from bot.services.filter_set import CompiledFilter, invalidate_filter_set
+from bot.services.log_writer import log_writer
+
+regex_sandbox = RegexSandbox(workers=settings.REGEX_WORKERS)
+
+STRIKES_TTL = 3600 # Seconds, timeouts older than this are forgotten
+
+def _strikes_key(chat_id: int, filter_id: int) -> str:
+    return f"regex_timeouts:{chat_id}:{filter_id}"
+
+def _disabled_key(chat_id: int) -> str:
+    return f"regex_disabled:{chat_id}"
+
+async def sandboxed_search(f: CompiledFilter, chat_id: int, text: str, budget: float) -> tuple[bool, float]:
+    """
+    Runs an untrusted regex within what is left of the message's time budget.
+    Returns the result and the budget left; a timeout counts as no match.
+    Only the worker's matching time is charged, not waiting for a free worker.
+    """
+    if budget <= 0:
+        metrics.incr("regex.budget_exhausted")
+        return False, 0
+
+    try:
+        found, spent = await regex_sandbox.search(f.pattern, text, timeout=budget)
+    except asyncio.TimeoutError:
+        # The worker was killed mid-match, the pattern itself is slow
+        metrics.incr("regex.timeouts")
+        await record_timeout(chat_id, f.id)
+        return False, 0
+    return found, budget - spent
+
+async def record_timeout(chat_id: int, filter_id: int):
+    key = _strikes_key(chat_id, filter_id)
+    strikes = await redis_client.incr(key)
+    await redis_client.expire(key, STRIKES_TTL)
+    if strikes >= settings.REGEX_MAX_TIMEOUTS:
+        await disable_filter(chat_id, filter_id, strikes)
+
+async def disable_filter(chat_id: int, filter_id: int, strikes: int):
+    async for session in get_session():
+        await session.execute(update(Filter).where(Filter.id == filter_id).values(is_active=False))
+        await session.commit()
+    invalidate_filter_set(chat_id)
+
+    await redis_client.sadd(_disabled_key(chat_id), filter_id)
+    await redis_client.delete(_strikes_key(chat_id, filter_id))
+
+    logging.warning(f"Regex filter {filter_id} in {chat_id} disabled after {strikes} timeouts")
+    log_writer.submit(chat_id, 0, "filter_disabled", f"Regex filter {filter_id} timed out {strikes} times")
+
+async def get_disabled(chat_id: int) -> set[int]:
+    """Filters switched off for timing out, shown in the admin panel until re-enabled."""
+    return {int(x) for x in await redis_client.smembers(_disabled_key(chat_id))}
+
+async def clear_disabled(chat_id: int, *filter_ids: int):
+    if filter_ids:
+        await redis_client.srem(_disabled_key(chat_id), *filter_ids)
+        for filter_id in filter_ids:
+            await redis_client.delete(_strikes_key(chat_id, filter_id))
@@ -0,0 +1,205 @@
+import string
+try:
+    from re import _parser as sre_parse
+except ImportError: # Python < 3.11
+    import sre_parse
+
+# Separator of generated smart regexes: \s is a subset of [\W_], the three
+# adjacent stars only add backtracking
+LEGACY_SEPARATOR = r"\s*[\W_]*\s*"
+SAFE_SEPARATOR = r"[\W_]*"
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+_ZERO_WIDTH = {sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT}
+
+# Characters the sets of a pattern are compared on, plus the pattern's own literals
+_SAMPLE = set(string.printable) | set("абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВЕЁКМНОРСТХ") | set(" —«»№€😀")
+
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: str.isdecimal,
+    sre_parse.CATEGORY_NOT_DIGIT: lambda c: not c.isdecimal(),
+    sre_parse.CATEGORY_SPACE: str.isspace,
+    sre_parse.CATEGORY_NOT_SPACE: lambda c: not c.isspace(),
+    sre_parse.CATEGORY_WORD: lambda c: c.isalnum() or c == "_",
+    sre_parse.CATEGORY_NOT_WORD: lambda c: not (c.isalnum() or c == "_"),
+}
+
+class RiskyPattern(Exception):
+    """The pattern can backtrack catastrophically, the message is shown to the admin."""
+
+def rewrite_pattern(pattern: str) -> str:
+    """Replaces constructs with an equivalent that does not backtrack."""
+    return pattern.replace(LEGACY_SEPARATOR, SAFE_SEPARATOR)
+
+def analyze_pattern(pattern: str) -> str | None:
+    """
+    Looks for the usual sources of catastrophic backtracking. Returns why the
+    pattern is risky, None if it looks safe. A heuristic, patterns it lets
+    through still run under a time budget.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None # Invalid patterns are rejected by re.compile
+    alphabet = _SAMPLE | _literals(parsed)
+    try:
+        _check(list(parsed), alphabet)
+    except RiskyPattern as e:
+        return str(e)
+    except RecursionError:
+        return "слишком глубокая вложенность"
+    return None
+
+def _literals(items) -> set[str]:
+    chars = set()
+    for op, av in items:
+        if op == sre_parse.LITERAL or op == sre_parse.NOT_LITERAL:
+            chars.add(chr(av))
+        elif op == sre_parse.RANGE:
+            chars.update((chr(av[0]), chr(av[1])))
+        for child in _children(op, av):
+            chars |= _literals(child)
+    return chars
+
+def _children(op, av) -> list:
+    # Sub-sequences of a node
+    if op in _REPEATS or op == getattr(sre_parse, "POSSESSIVE_REPEAT", None):
+        return [av[2]]
+    if op == sre_parse.SUBPATTERN:
+        return [av[3]]
+    if op == sre_parse.BRANCH:
+        return list(av[1])
+    if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+        return [av[1]]
+    if op == getattr(sre_parse, "ATOMIC_GROUP", None):
+        return [av]
+    if op == sre_parse.IN:
+        return [av]
+    return []
+
+def _matches_in(items, c: str) -> bool:
+    negate = False
+    found = False
+    for op, av in items:
+        if op == sre_parse.NEGATE:
+            negate = True
+        elif op == sre_parse.LITERAL:
+            found = found or chr(av) == c
+        elif op == sre_parse.RANGE:
+            found = found or av[0] <= ord(c) <= av[1]
+        elif op == sre_parse.CATEGORY:
+            found = found or _CATEGORIES.get(av, lambda _: True)(c)
+    return found != negate
+
+def _casefold(chars: set[str]) -> frozenset[str]:
+    # Filters are compiled with re.IGNORECASE
+    return frozenset(chars | {c.lower() for c in chars} | {c.upper() for c in chars})
+
+def _first(items, alphabet: set[str]) -> tuple[frozenset[str], bool]:
+    """Characters a sequence can start with, and whether it can match empty."""
+    chars = set()
+    for op, av in items:
+        node_chars, nullable = _first_node(op, av, alphabet)
+        chars |= node_chars
+        if not nullable:
+            return _casefold(chars), False
+    return _casefold(chars), True
+
+def _first_node(op, av, alphabet: set[str]) -> tuple[set[str], bool]:
+    if op == sre_parse.LITERAL:
+        return {chr(av)}, False
+    if op == sre_parse.NOT_LITERAL:
+        return {c for c in alphabet if c != chr(av)}, False
+    if op == sre_parse.ANY:
+        return set(alphabet), False
+    if op == sre_parse.IN:
+        return {c for c in alphabet if _matches_in(av, c) or _matches_in(av, c.swapcase())}, False
+    if op in _REPEATS or op == getattr(sre_parse, "POSSESSIVE_REPEAT", None):
+        chars, nullable = _first(av[2], alphabet)
+        return set(chars), nullable or av[0] == 0
+    if op == sre_parse.SUBPATTERN:
+        chars, nullable = _first(av[3], alphabet)
+        return set(chars), nullable
+    if op == getattr(sre_parse, "ATOMIC_GROUP", None):
+        chars, nullable = _first(av, alphabet)
+        return set(chars), nullable
+    if op == sre_parse.BRANCH:
+        chars = set()
+        nullable = False
+        for branch in av[1]:
+            branch_chars, branch_nullable = _first(branch, alphabet)
+            chars |= branch_chars
+            nullable = nullable or branch_nullable
+        return chars, nullable
+    if op in _ZERO_WIDTH:
+        return set(), True
+    # Backreferences and the like: could be anything
+    return set(alphabet), True
+
+def _is_repeat(op, av) -> bool:
+    return op in _REPEATS and av[1] > 1
+
+_SINGLE_CHAR = {sre_parse.LITERAL, sre_parse.NOT_LITERAL, sre_parse.ANY, sre_parse.IN}
+
+def _check(items: list, alphabet: set[str], repeat_first: frozenset[str] | None = None):
+    # repeat_first: what the enclosing repeat body starts with, None outside of repeats
+    for i, (op, av) in enumerate(items):
+        if _is_repeat(op, av):
+            body = list(av[2])
+            _check_repeat_body(body, alphabet)
+            _check(body, alphabet, _first(body, alphabet)[0])
+
+            # x*y* over overlapping characters: every split of the run is tried
+            if av[1] == sre_parse.MAXREPEAT and i + 1 < len(items):
+                next_op, next_av = items[i + 1]
+                if _is_repeat(next_op, next_av) and next_av[1] == sre_parse.MAXREPEAT:
+                    next_body = list(next_av[2])
+                    single = len(body) == 1 and len(next_body) == 1 and body[0][0] in _SINGLE_CHAR and next_body[0][0] in _SINGLE_CHAR
+                    if single and _first(body, alphabet)[0] & _first(next_body, alphabet)[0]:
+                        raise RiskyPattern("соседние квантификаторы с общими символами, например \\d+\\d+")
+        elif op == sre_parse.BRANCH and repeat_first is not None:
+            _check_branches(av[1], alphabet, repeat_first)
+            for branch in av[1]:
+                _check(list(branch), alphabet, repeat_first)
+        elif op != sre_parse.IN:
+            for child in _children(op, av):
+                _check(list(child), alphabet, repeat_first)
+
+def _check_repeat_body(body: list, alphabet: set[str]):
+    # Look through a single group or alternation, (?:(a+))+ is the same thing
+    if len(body) == 1 and body[0][0] == sre_parse.SUBPATTERN:
+        return _check_repeat_body(list(body[0][1][3]), alphabet)
+    if len(body) == 1 and body[0][0] == sre_parse.BRANCH:
+        for branch in body[0][1][1]:
+            _check_repeat_body(list(branch), alphabet)
+        return
+
+    # An inner repeat is only safe when the body also has a mandatory part
+    # it cannot consume, as in (a+b)*; (a+)+ and (\w+\s?)* are not
+    for node in body:
+        op, av = node
+        if not _is_repeat(op, av):
+            continue
+        inner_chars = _first(av[2], alphabet)[0]
+        separated = False
+        for other in body:
+            if other is node:
+                continue
+            chars, nullable = _first_node(other[0], other[1], alphabet)
+            if not nullable and not (_casefold(chars) & inner_chars):
+                separated = True
+                break
+        if not separated:
+            raise RiskyPattern("вложенные квантификаторы, например (a+)+")
+
+def _check_branches(branches: list, alphabet: set[str], follow: frozenset[str]):
+    # (ab|a\w)*, (a|aa)+: a character can be consumed by several alternatives.
+    # An empty alternative leaves the character to the next iteration.
+    seen = frozenset()
+    for branch in branches:
+        chars, nullable = _first(branch, alphabet)
+        if nullable:
+            chars |= follow
+        if chars & seen:
+            raise RiskyPattern("альтернативы с общим началом внутри повторения, например (a|aa)+")
+        seen |= chars
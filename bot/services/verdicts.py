@@ -0,0 +1,33 @@
+from bot.core.config import settings
+from bot.core.lru import LRUCache
+from bot.core.metrics import metrics
+
+# Filters whose result depends on the message content only. Flood, repeats
+# and channels depend on the sender and on history, they always run.
+CONTENT_TYPES = frozenset({"regex", "keywords", "mat", "link", "caps", "crypto", "contacts", "media"})
+
+CLEAN = -1
+
+class VerdictCache:
+    """
+    Outcome of the content filters per (content hash, filter config version):
+    the index of the matching filter in ChatFilterSet.compiled, or CLEAN.
+    Chats with the same filters share entries, a config change gives the
+    chat a new version so old entries are never looked up again.
+    """
+
+    def __init__(self, maxsize: int = 100000, ttl: float = 300):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, content_hash: bytes, version: bytes) -> int | None:
+        verdict = self._cache.get((content_hash, version))
+        metrics.incr("verdicts.miss" if verdict is None else "verdicts.hit")
+        return verdict
+
+    def set(self, content_hash: bytes, version: bytes, verdict: int):
+        self._cache.set((content_hash, version), verdict)
+
+    def clear(self):
+        self._cache.clear()
+
+verdicts = VerdictCache(maxsize=settings.VERDICT_CACHE_SIZE, ttl=settings.VERDICT_CACHE_TTL)
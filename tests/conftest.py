@@ -0,0 +1,8 @@
+import os
+
+# Settings are read at import time; the tests run without Redis or Postgres
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.environ.setdefault("ADMIN_IDS", "1")
+os.environ.setdefault("USE_REDIS", "false")
+os.environ.setdefault("USE_SQLITE", "true")
+os.environ.setdefault("SQLITE_DB_PATH", ":memory:")
@@ -0,0 +1,39 @@
+import asyncio
+from bot.core.database import LazySession
+
+def test_after_commit_runs_on_commit_only():
+    async def run():
+        done = []
+
+        async def mark():
+            done.append(True)
+
+        async with LazySession() as db:
+            db.after_commit(mark)
+        assert done == [True]
+
+        try:
+            async with LazySession() as db:
+                db.after_commit(mark)
+                raise RuntimeError("handler failed")
+        except RuntimeError:
+            pass
+        # Rolled back: the callback is dropped
+        assert done == [True]
+    asyncio.run(run())
+
+def test_failing_callback_does_not_break_commit():
+    async def run():
+        async def broken():
+            raise ValueError("boom")
+
+        done = []
+
+        async def mark():
+            done.append(True)
+
+        async with LazySession() as db:
+            db.after_commit(broken)
+            db.after_commit(mark)
+        assert done == [True]
+    asyncio.run(run())
@@ -0,0 +1,42 @@
+from bot.services.domains import DomainRules, host_of, make_domain_rule, parse_domain_rule
+
+def test_host_of():
+    assert host_of("https://Example.COM/path?q=1") == "example.com"
+    assert host_of("t.me/channel") == "t.me"
+    assert host_of("http://[broken") is None
+
+def test_rule_round_trip():
+    assert parse_domain_rule(make_domain_rule("example.com", True)) == (True, "example.com")
+    assert parse_domain_rule("deny:Ads.Example.com.") == (False, "ads.example.com")
+    assert parse_domain_rule("https://example.com") is None
+    assert parse_domain_rule(None) is None
+
+def test_internationalized_domains_match_either_form():
+    assert parse_domain_rule("allow:пример.рф") == (True, "xn--e1afmkfd.xn--p1ai")
+    assert host_of("https://xn--e1afmkfd.xn--p1ai/") == "xn--e1afmkfd.xn--p1ai"
+
+def test_rule_covers_subdomains():
+    rules = DomainRules([(True, "example.com")])
+    assert not rules.is_blocked("example.com")
+    assert not rules.is_blocked("www.example.com")
+    assert rules.is_blocked("notexample.com")
+
+def test_most_specific_rule_wins():
+    rules = DomainRules([(True, "example.com"), (False, "ads.example.com")])
+    assert not rules.is_blocked("example.com")
+    assert rules.is_blocked("ads.example.com")
+    assert rules.is_blocked("x.ads.example.com")
+
+def test_unlisted_domains():
+    # With an allow list everything else is blocked
+    assert DomainRules([(True, "example.com")]).is_blocked("other.org")
+    # With deny rules only, everything else is allowed
+    assert not DomainRules([(False, "spam.org")]).is_blocked("other.org")
+    assert DomainRules([(False, "spam.org")]).is_blocked("spam.org")
+
+def test_unparsable_host_is_blocked():
+    assert DomainRules([(False, "spam.org")]).is_blocked(None)
+
+def test_empty_rules_are_falsy():
+    assert not DomainRules()
+    assert DomainRules([(False, "spam.org")])
@@ -0,0 +1,111 @@
+import asyncio
+from bot.core.models import Filter
+from bot.services import filter_set as filter_set_module
+from bot.services.filter_set import ChatFilterSet, CompiledFilter, RegexGroup, is_combinable
+from bot.services.filter_stats import MIN_RUNS, FilterStat
+
+def make_filter(id: int, filter_type: str, pattern: str | None = None, action: str = "delete") -> Filter:
+    return Filter(id=id, chat_id=-100, filter_type=filter_type, pattern=pattern, action=action, is_active=True)
+
+def compiled(pattern: str, id: int = 1) -> CompiledFilter:
+    return CompiledFilter(make_filter(id, "regex", pattern))
+
+def test_plain_patterns_are_combinable():
+    assert is_combinable(compiled(r"free\s+money"))
+    assert is_combinable(compiled(r"(?i:casino)"))
+
+def test_group_references_are_not_combinable():
+    assert not is_combinable(compiled(r"(a)\1"))
+    assert not is_combinable(compiled(r"(?P<word>\w+) (?P=word)"))
+
+def test_global_inline_flags_are_not_combinable():
+    # Python 3.10 still compiles these mid-pattern, where they would apply to every filter
+    assert not is_combinable(compiled(r"(?s)a.b"))
+    assert not is_combinable(compiled(r"(?x) a b"))
+    assert not is_combinable(compiled(r"(?m)^spam"))
+
+def test_regex_group_reports_matching_filter():
+    filters = [compiled(r"spam", 1), compiled(r"casino\d+", 2)]
+    group = RegexGroup(filters)
+    assert group.search("CASINO777") is filters[1]
+    assert group.search("no match") is None
+
+def test_combinable_regexes_share_one_entry():
+    filter_set = ChatFilterSet(-100, [
+        make_filter(1, "regex", r"spam"),
+        make_filter(2, "regex", r"(?s)a.b"),
+        make_filter(3, "regex", r"casino"),
+    ])
+    groups = [f for f in filter_set.filters if isinstance(f, RegexGroup)]
+    assert len(groups) == 1
+    assert {f.id for f in groups[0].filters.values()} == {1, 3}
+    assert len(filter_set) == 2
+
+def measured(label: str, runs: int, hits: int, seconds: float) -> FilterStat:
+    stat = FilterStat(label)
+    stat.runs, stat.hits, stat.seconds = runs, hits, seconds
+    return stat
+
+def reorder_set() -> ChatFilterSet:
+    return ChatFilterSet(-100, [
+        make_filter(1, "keywords", "spam"),
+        make_filter(2, "caps"),
+        make_filter(3, "media", "photo"),
+        make_filter(4, "flood", "5/10"),
+        make_filter(5, "regex", r"free\s+money"),
+    ])
+
+def test_reorder_by_cost_over_hit_rate():
+    filter_set = reorder_set()
+    filter_set.reorder({
+        "1": measured("keywords", 1000, 1, 0.5),
+        "2": measured("caps", 1000, 500, 0.1),
+        "5": measured("regex", 1000, 10, 0.2),
+    })
+    # Pinned checks first, then cheap and often matching filters
+    assert [f.filter_type for f in filter_set.filters] == ["flood", "media", "caps", "regex", "keywords"]
+
+def test_unmeasured_filters_go_first():
+    filter_set = reorder_set()
+    filter_set.reorder({
+        "1": measured("keywords", 1000, 500, 0.1),
+        "2": measured("caps", MIN_RUNS - 1, 0, 1.0),
+    })
+    assert [f.filter_type for f in filter_set.filters][2:4] == ["caps", "regex"]
+
+def test_reorder_keeps_verdict_index_in_step():
+    filter_set = reorder_set()
+    filter_set.reorder({"1": measured("keywords", 1000, 999, 0.001)})
+    for i, f in enumerate(filter_set.compiled):
+        assert filter_set.filters[filter_set.entry_of[i]] is f
+
+def counting_loads(monkeypatch) -> list[int]:
+    loads = []
+    async def load(chat_id: int) -> ChatFilterSet:
+        loads.append(chat_id)
+        await asyncio.sleep(0.01)
+        return ChatFilterSet(chat_id, [make_filter(1, "caps")])
+    monkeypatch.setattr(filter_set_module, "load_filter_set", load)
+    return loads
+
+def test_concurrent_misses_share_one_load(monkeypatch):
+    loads = counting_loads(monkeypatch)
+    async def run():
+        results = await asyncio.gather(*(filter_set_module.get_filter_set(-201) for _ in range(10)))
+        assert all(r is results[0] for r in results)
+        # Cached afterwards
+        assert await filter_set_module.get_filter_set(-201) is results[0]
+    asyncio.run(run())
+    assert loads == [-201]
+
+def test_load_racing_an_invalidation_is_not_joined_or_cached(monkeypatch):
+    loads = counting_loads(monkeypatch)
+    async def run():
+        outdated = asyncio.create_task(filter_set_module.get_filter_set(-202))
+        await asyncio.sleep(0)
+        filter_set_module._drop(-202)
+        fresh = await filter_set_module.get_filter_set(-202)
+        assert await outdated is not fresh
+        assert await filter_set_module.get_filter_set(-202) is fresh
+    asyncio.run(run())
+    assert loads == [-202, -202]
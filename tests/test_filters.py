@@ -0,0 +1,60 @@
+import re
+import pytest
+from bot.services.filters import FEATURE_CAPS, FEATURE_CRYPTO, FEATURE_LINK, FEATURE_PHONE, classify, find_links
+
+# The separate checks classify() replaced, as they were
+def old_check_link(text: str) -> bool:
+    return bool(re.search(r"(https?://[^\s]+)|(www\.[^\s]+)", text))
+
+def old_check_caps(text: str, threshold: float = 0.7) -> bool:
+    if len(text) < 5:
+        return False
+    return sum(1 for c in text if c.isupper()) / len(text) > threshold
+
+def old_check_crypto(text: str) -> bool:
+    patterns = [
+        r"\b(bc1|[13])[a-zA-HJ-NP-Z0-9]{25,39}\b",
+        r"\b0x[a-fA-F0-9]{40}\b",
+        r"\bT[A-Za-z1-9]{33}\b",
+    ]
+    return any(re.search(p, text) for p in patterns)
+
+def old_check_phone(text: str) -> bool:
+    digits = re.sub(r"\D", "", text)
+    return len(digits) >= 7 and bool(re.search(r"\+?[\d\s\-\(\)]{7,}", text))
+
+ETH = "0x" + "ab12" * 10
+
+TEXTS = [
+    "hello everyone",
+    "HELLO EVERYONE JOIN https://T.ME/SPAMCHANNEL NOW",
+    "ПРИВЕТ ВСЕМ, ЗАХОДИТЕ",
+    f"send to https://etherscan.io/address/{ETH}",
+    f"wallet {ETH} pls",
+    "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq",
+    "TQn9Y2khEsLJW1ChVWFMSMeRDow5KcbLSE",
+    "write to wa.me/79991234567",
+    "call +7 (999) 123-45-67",
+    "see www.example.com",
+    "no links, no numbers: 2024",
+]
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_classify_matches_old_checks(text):
+    features = classify(text)
+    assert bool(features & FEATURE_LINK) == old_check_link(text)
+    assert bool(features & FEATURE_CAPS) == old_check_caps(text)
+    assert bool(features & FEATURE_CRYPTO) == old_check_crypto(text)
+    assert bool(features & FEATURE_PHONE) == old_check_phone(text)
+
+def test_overlapping_features_are_all_found():
+    assert classify(f"https://etherscan.io/address/{ETH}") & FEATURE_CRYPTO
+    assert classify("wa.me/79991234567") & FEATURE_PHONE
+    assert classify("HELLO EVERYONE JOIN https://T.ME/SPAMCHANNEL NOW") & FEATURE_CAPS
+
+def test_phone_digits_are_counted_in_the_number():
+    # Seven digits spread over the text are not a phone number
+    assert not classify("order 12, row 345, seat 67") & FEATURE_PHONE
+
+def test_find_links():
+    assert find_links("a https://x.org/p and www.y.com") == ["https://x.org/p", "www.y.com"]
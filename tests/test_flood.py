@@ -0,0 +1,22 @@
+from bot.services.flood import DEFAULT_USER_LIMIT, format_limit, make_flood_pattern, parse_flood_pattern
+
+def test_user_limit_only():
+    assert parse_flood_pattern("3/10") == ((3, 10), None)
+
+def test_user_and_chat_limits():
+    assert parse_flood_pattern("5/10,50/30") == ((5, 10), (50, 30))
+    assert parse_flood_pattern(" 5 / 10 , 50/30 ") == ((5, 10), (50, 30))
+
+def test_invalid_limits_fall_back():
+    assert parse_flood_pattern(None) == (DEFAULT_USER_LIMIT, None)
+    assert parse_flood_pattern("") == (DEFAULT_USER_LIMIT, None)
+    assert parse_flood_pattern("abc,1/x") == (DEFAULT_USER_LIMIT, None)
+    assert parse_flood_pattern("0/10,-1/5") == (DEFAULT_USER_LIMIT, None)
+
+def test_round_trip():
+    for user_limit, chat_limit in (((3, 10), None), ((20, 60), (100, 30))):
+        assert parse_flood_pattern(make_flood_pattern(user_limit, chat_limit)) == (user_limit, chat_limit)
+
+def test_format_limit():
+    assert format_limit((5, 10)) == "5/10с"
+    assert format_limit(None) == "выкл"
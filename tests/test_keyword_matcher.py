@@ -0,0 +1,41 @@
+from bot.services.keyword_matcher import KeywordMatcher, parse_keywords
+
+def test_finds_keyword_anywhere_in_text():
+    matcher = KeywordMatcher(["spam", "casino"])
+    assert "buy cheap spam now" in matcher
+    assert "best casino" in matcher
+    assert "hello world" not in matcher
+
+def test_overlapping_keywords_use_failure_links():
+    matcher = KeywordMatcher()
+    matcher.add("abcd", "long")
+    matcher.add("bc", "short")
+    matcher.build()
+    # "abce" fails after "abc", the "bc" suffix must still be found
+    assert matcher.search("xabce") == "short"
+    assert matcher.search("abcd") == "short"
+
+def test_keyword_that_is_suffix_of_another():
+    matcher = KeywordMatcher()
+    matcher.add("she", 1)
+    matcher.add("he", 2)
+    matcher.build()
+    assert matcher.search("the") == 2
+    assert matcher.search("ushe") == 1
+
+def test_first_payload_wins_for_duplicates():
+    matcher = KeywordMatcher()
+    matcher.add("word", "first")
+    matcher.add("word", "second")
+    assert len(matcher) == 1
+    # Built lazily on the first search after an add
+    assert matcher.search("a word") == "first"
+
+def test_empty_matcher():
+    matcher = KeywordMatcher([""])
+    assert not matcher
+    assert matcher.search("anything") is None
+
+def test_parse_keywords():
+    assert parse_keywords(" Spam, ,CASINO ,") == ["spam", "casino"]
+    assert parse_keywords(None) == []
@@ -0,0 +1,68 @@
+import asyncio
+from sqlalchemy.exc import IntegrityError, OperationalError
+from bot.services import log_writer as log_writer_module
+from bot.services.log_writer import LogWriter
+
+class FakeSession:
+    def __init__(self, db: "FakeDatabase"):
+        self.db = db
+
+    async def execute(self, stmt):
+        self.db.calls += 1
+        if self.db.down:
+            raise OperationalError("INSERT", {}, ConnectionError("connection refused"))
+        rows = [value for key, value in stmt.compile().params.items() if key.startswith("chat_id")]
+        if self.db.bad in rows:
+            raise IntegrityError("INSERT", {}, ValueError("bad row"))
+        self.rows = rows
+
+    async def commit(self):
+        self.db.written.extend(self.rows)
+
+class FakeDatabase:
+    def __init__(self, bad: int | None = None, down: bool = False):
+        self.bad = bad
+        self.down = down
+        self.calls = 0
+        self.written = []
+
+    async def get_session(self):
+        yield FakeSession(self)
+
+def rows(count: int) -> list[dict]:
+    return [{"chat_id": i, "user_id": 1, "action": "delete", "details": ""} for i in range(count)]
+
+def test_only_rejected_rows_are_dropped(monkeypatch):
+    db = FakeDatabase(bad=5)
+    monkeypatch.setattr(log_writer_module, "get_session", db.get_session)
+    writer = LogWriter(batch_size=10)
+    writer._pending = rows(8)
+    assert asyncio.run(writer._flush(writer._pending[:10]))
+    assert sorted(db.written) == [0, 1, 2, 3, 4, 6, 7]
+    assert writer._pending == []
+
+def test_outage_keeps_the_batch(monkeypatch):
+    db = FakeDatabase(down=True)
+    monkeypatch.setattr(log_writer_module, "get_session", db.get_session)
+    writer = LogWriter(batch_size=500)
+    writer._pending = rows(500)
+    assert not asyncio.run(writer._flush(writer._pending[:500]))
+    # One attempt, not a bisection down to single rows
+    assert db.calls == 1
+    assert len(writer._pending) == 500
+
+    db.down = False
+    assert asyncio.run(writer._flush(writer._pending[:500]))
+    assert len(db.written) == 500 and writer._pending == []
+
+def test_stop_gives_up_during_outage(monkeypatch):
+    db = FakeDatabase(down=True)
+    monkeypatch.setattr(log_writer_module, "get_session", db.get_session)
+    writer = LogWriter(batch_size=10)
+
+    async def run():
+        for i in range(25):
+            writer.submit(i, 1, "delete", "")
+        await asyncio.wait_for(writer.stop(), 1)
+    asyncio.run(run())
+    assert writer._pending == [] and db.written == []
@@ -0,0 +1,84 @@
+import asyncio
+from bot.core.memory_cache import MemoryCache
+
+def test_expiry_heap_stays_bounded():
+    async def run():
+        cache = MemoryCache()
+        for i in range(10000):
+            await cache.set("key", i, ex=60)
+        assert len(cache._expiry_heap) <= 2 * len(cache.expires) + 64
+        assert await cache.get("key") == "9999"
+    asyncio.run(run())
+
+def test_keys_survive_stream_growth():
+    async def run():
+        cache = MemoryCache(max_entries=100, max_bytes=10000, max_stream_bytes=5000)
+        assert await cache.set("updates:lease:0", "worker", nx=True, px=15000)
+        for _ in range(500):
+            await cache.xadd("updates:0", {"update": "x" * 100})
+        assert await cache.get("updates:lease:0") == "worker"
+        await cache.set("admins:-100", "1")
+        assert await cache.get("admins:-100") == "1"
+    asyncio.run(run())
+
+def test_streams_are_trimmed_to_their_budget():
+    async def run():
+        cache = MemoryCache(max_stream_bytes=5000)
+        for i in range(500):
+            last = await cache.xadd("updates:0", {"update": "x" * 100})
+        assert 0 < cache.stream_bytes <= 5000
+        assert len(cache.streams["updates:0"]) < 500
+        # The newest entries are the ones kept
+        assert cache.streams["updates:0"][-1][0] == last
+    asyncio.run(run())
+
+def test_stream_maxlen():
+    async def run():
+        cache = MemoryCache()
+        for _ in range(5):
+            await cache.xadd("updates:0", {"update": "x"}, maxlen=2)
+        assert len(cache.streams["updates:0"]) == 2
+    asyncio.run(run())
+
+def test_xreadgroup_reads_and_acks():
+    async def run():
+        cache = MemoryCache()
+        await cache.xgroup_create("s", "g", id="0", mkstream=True)
+        entry_id = await cache.xadd("s", {"a": "1"})
+        assert await cache.xreadgroup("g", "c", {"s": ">"}, count=10) == [["s", [(entry_id, {"a": "1"})]]]
+        # Delivered entries are pending until acknowledged
+        assert await cache.xreadgroup("g", "c", {"s": ">"}, count=10) == []
+        assert await cache.xack("s", "g", entry_id) == 1
+    asyncio.run(run())
+
+def test_xreadgroup_without_block_returns_at_once():
+    async def run():
+        cache = MemoryCache()
+        await cache.xgroup_create("s", "g", id="0", mkstream=True)
+        assert await asyncio.wait_for(cache.xreadgroup("g", "c", {"s": ">"}), 0.5) == []
+    asyncio.run(run())
+
+def test_xreadgroup_block_waits_for_timeout():
+    async def run():
+        cache = MemoryCache()
+        await cache.xgroup_create("s", "g", id="0", mkstream=True)
+        assert await asyncio.wait_for(cache.xreadgroup("g", "c", {"s": ">"}, block=50), 1) == []
+    asyncio.run(run())
+
+def test_xreadgroup_block_zero_waits_forever():
+    async def run():
+        cache = MemoryCache()
+        await cache.xgroup_create("s", "g", id="0", mkstream=True)
+        read = asyncio.create_task(cache.xreadgroup("g", "c", {"s": ">"}, block=0))
+        await asyncio.sleep(0.2)
+        assert not read.done()
+        entry_id = await cache.xadd("s", {"a": "1"})
+        assert await asyncio.wait_for(read, 1) == [["s", [(entry_id, {"a": "1"})]]]
+    asyncio.run(run())
+
+def test_xreadgroup_history_does_not_block():
+    async def run():
+        cache = MemoryCache()
+        await cache.xgroup_create("s", "g", id="0", mkstream=True)
+        assert await asyncio.wait_for(cache.xreadgroup("g", "c", {"s": "0"}, block=0), 0.5) == []
+    asyncio.run(run())
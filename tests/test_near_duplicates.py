@@ -0,0 +1,40 @@
+from bot.services.near_duplicates import Fingerprint, NearDuplicateIndex, simhash
+
+def distance(a: str, b: str) -> int:
+    return (simhash(a) ^ simhash(b)).bit_count()
+
+SPAM = "заработок без вложений от 5000 в день пиши в личку за подробностями"
+
+def test_simhash_is_stable():
+    assert simhash(SPAM) == simhash(SPAM)
+    assert simhash(SPAM) < 2 ** 64
+
+def test_near_copies_are_close():
+    assert distance(SPAM, SPAM.replace("5000", "7000")) <= 10
+    assert distance(SPAM, SPAM + " !!!") <= 10
+
+def test_unrelated_texts_are_far():
+    other = "завтра собрание в шесть вечера в актовом зале, приходите все"
+    assert distance(SPAM, other) > 10
+
+def test_same_user_repeat_is_detected():
+    index = NearDuplicateIndex(max_distance=10)
+    first = Fingerprint(simhash(SPAM), exact=False, shared=True)
+    copy = Fingerprint(simhash(SPAM.replace("5000", "7000")), exact=False, shared=True)
+    assert not index.check(-100, 1, first, window=60)
+    assert index.check(-100, 1, copy, window=60)
+
+def test_cross_user_repeat_needs_enough_users():
+    index = NearDuplicateIndex(max_distance=10, cross_user_min=3)
+    fp = Fingerprint(simhash(SPAM), exact=False, shared=True)
+    assert not index.check(-100, 1, fp, window=60)
+    assert not index.check(-100, 2, fp, window=60)
+    assert index.check(-100, 3, fp, window=60)
+
+def test_short_texts_are_compared_exactly():
+    index = NearDuplicateIndex(cross_user_min=2)
+    ok = Fingerprint(1, exact=True, shared=False)
+    assert not index.check(-100, 1, ok, window=60)
+    # Different users saying "ok" is not spam
+    assert not index.check(-100, 2, ok, window=60)
+    assert index.check(-100, 1, ok, window=60)
@@ -0,0 +1,60 @@
+from bot.core.models import Filter
+from bot.services.filter_set import ChatFilterSet, SmartGroup
+from bot.services.normalizer import MAX_VARIANTS, normalize, make_smart_pattern, parse_smart_pattern, smart_variants
+
+def test_homoglyphs_and_leetspeak_fold_to_latin():
+    # Cyrillic look-alikes and single-letter leetspeak
+    assert normalize("Саsinо") == "casino"
+    assert normalize("Сп@м") == normalize("cn4m") == "cnam"
+    assert normalize("$ale 50%") == "saleso"
+
+def test_separators_and_emoji_are_dropped():
+    assert normalize("s.p-a_m 🔥") == "spam"
+
+def test_distinct_letters_stay_distinct():
+    assert normalize("zoo") == "zoo"
+    assert normalize("line") != normalize("iine")
+    assert normalize("cat") != normalize("kat")
+
+def test_shared_look_alikes_fold_to_one_character():
+    # 3 stands for e and z; 1, ! and | for i and l: none of them becomes a letter
+    assert normalize("3") == "3"
+    assert normalize("1") == normalize("!") == normalize("|") == "1"
+    assert normalize("hi!") == "hi1"
+
+def test_smart_variants():
+    assert smart_variants("free") == ["free", "fre3", "fr3e", "fr33"]
+    assert smart_variants("spam") == ["spam"]
+    # Shared characters in the word stand for either letter
+    assert set(smart_variants("1")) == {"1", "i", "l"}
+    assert len(smart_variants("illegalillegal")) == MAX_VARIANTS
+
+def smart_group(*words: str) -> SmartGroup:
+    filter_set = ChatFilterSet(-100, [
+        Filter(id=i, chat_id=-100, filter_type="regex", pattern=make_smart_pattern(word), action="delete")
+        for i, word in enumerate(words, 1)
+    ])
+    return filter_set.smart_group
+
+def test_smart_words_match_leetspeak():
+    group = smart_group("free", "money", "casino")
+    for text, word in (("fr33 stuff", "free"), ("m0n3y!!", "money"), ("c@s1no", "casino"), ("C@S!NO", "casino")):
+        found = group.search(normalize(text))
+        assert found is not None and found.smart_word == word, text
+
+def test_smart_words_do_not_merge_letters():
+    group = smart_group("zoo", "line")
+    assert group.search(normalize("eoo")) is None
+    assert group.search(normalize("iine")) is None
+    assert group.search(normalize("3oo")).smart_word == "zoo"
+    assert group.search(normalize("|1ne")).smart_word == "line"
+
+def test_normalize_is_idempotent():
+    text = "Прив3т, Вася! $$$ 0ff3r"
+    assert normalize(normalize(text)) == normalize(text)
+
+def test_smart_pattern_round_trip():
+    pattern = make_smart_pattern("Сп@м")
+    assert parse_smart_pattern(pattern) == normalize("Сп@м")
+    assert parse_smart_pattern("smart:") is None
+    assert parse_smart_pattern("[a-z]+") is None
@@ -0,0 +1,56 @@
+import asyncio
+from unittest.mock import AsyncMock
+from bot.services.punishment import PunishmentDispatcher
+
+def test_duplicate_punishment_is_coalesced():
+    async def run():
+        dispatcher = PunishmentDispatcher(workers=1, max_queue=10)
+        assert dispatcher.submit("mute", AsyncMock(), -100, 42)
+        assert not dispatcher.submit("mute", AsyncMock(), -100, 42)
+        # Another kind or another target is a separate job
+        assert dispatcher.submit("ban", AsyncMock(), -100, 42)
+        assert dispatcher.submit("mute", AsyncMock(), -100, 43)
+        await dispatcher.stop(timeout=1)
+    asyncio.run(run())
+
+def test_dropped_job_is_not_remembered():
+    async def run():
+        dispatcher = PunishmentDispatcher(workers=1, max_queue=1)
+        bot = AsyncMock()
+        # Fill the queue before the worker gets to run
+        assert dispatcher.submit("delete", bot, -100, 1)
+        assert not dispatcher.submit("delete", bot, -100, 2)
+        await dispatcher.stop(timeout=1)
+
+        # The dropped delete goes through on the next attempt
+        assert dispatcher.submit("delete", bot, -100, 2)
+        await dispatcher.stop(timeout=1)
+        assert [call.args for call in bot.delete_message.await_args_list] == [(-100, 1), (-100, 2)]
+    asyncio.run(run())
+
+def test_rate_limited_chat_does_not_stall_others():
+    async def run():
+        dispatcher = PunishmentDispatcher(workers=1, max_queue=100, chat_rate=1, chat_burst=1)
+        bot = AsyncMock()
+        # A raid: the first delete uses the chat's only token
+        for message_id in range(1, 6):
+            dispatcher.submit("delete", bot, -100, message_id)
+        dispatcher.submit("delete", bot, -200, 1)
+        await asyncio.sleep(0.2)
+        chats = [call.args[0] for call in bot.delete_message.await_args_list]
+        assert chats == [-100, -200]
+        await dispatcher.stop(timeout=0)
+    asyncio.run(run())
+
+def test_blocked_chat_is_retried_after_retry_after():
+    async def run():
+        dispatcher = PunishmentDispatcher(workers=1, max_queue=100)
+        bot = AsyncMock()
+        dispatcher._chat_bucket(-100).block(0.3)
+        dispatcher.submit("ban", bot, -100, 42)
+        dispatcher.submit("ban", bot, -200, 42)
+        await asyncio.sleep(0.1)
+        assert [call.args[0] for call in bot.ban_chat_member.await_args_list] == [-200]
+        await dispatcher.stop(timeout=1)
+        assert [call.args[0] for call in bot.ban_chat_member.await_args_list] == [-200, -100]
+    asyncio.run(run())
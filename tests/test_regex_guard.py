@@ -0,0 +1,39 @@
+import asyncio
+from bot.core.models import Filter
+from bot.core.redis import redis_client
+from bot.core.regex_sandbox import RegexSandbox
+from bot.services import regex_guard
+from bot.services.filter_set import CompiledFilter
+
+CATASTROPHIC = r"(a+)+$"
+TEXT = "a" * 40 + "b"
+
+def test_sandbox_timeout_surfaces():
+    async def run():
+        sandbox = RegexSandbox(workers=1)
+        try:
+            try:
+                await sandbox.search(CATASTROPHIC, TEXT, timeout=0.2)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                raise AssertionError("timeout was swallowed")
+            # The killed worker is replaced and serves the next search
+            found, spent = await sandbox.search(r"b$", TEXT, timeout=5)
+            assert found and spent < 5
+        finally:
+            sandbox.stop()
+    asyncio.run(run())
+
+def test_timeout_records_a_strike(monkeypatch):
+    async def run():
+        sandbox = RegexSandbox(workers=1)
+        monkeypatch.setattr(regex_guard, "regex_sandbox", sandbox)
+        f = CompiledFilter(Filter(id=7, chat_id=-100, filter_type="regex", pattern=CATASTROPHIC, action="delete"))
+        try:
+            found, left = await regex_guard.sandboxed_search(f, -100, TEXT, budget=0.2)
+        finally:
+            sandbox.stop()
+        assert not found and left == 0
+        assert await redis_client.get(regex_guard._strikes_key(-100, 7)) == "1"
+    asyncio.run(run())
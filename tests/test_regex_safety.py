@@ -0,0 +1,37 @@
+import pytest
+from bot.services.regex_safety import SAFE_SEPARATOR, LEGACY_SEPARATOR, analyze_pattern, rewrite_pattern
+
+@pytest.mark.parametrize("pattern", [
+    r"(a+)+$",
+    r"(?:(\w+))*x",
+    r"(\w+\s?)*$",
+    r"(a|aa)+b",
+    r"(xy|\wz)+$",
+    r"(ab|a\w+)*c",
+    r"\d+\d+x",
+    r".*.*=.*",
+])
+def test_risky_patterns(pattern):
+    assert analyze_pattern(pattern) is not None
+
+@pytest.mark.parametrize("pattern", [
+    r"casino",
+    r"free\s+money",
+    r"(a+b)*",
+    r"\d+-\d+",
+    r"(?:spam|scam)+",
+    # The parser factors it into a[b\w], nothing to choose between
+    r"(ab|a\w)*c",
+    r"https?://\S+",
+    r"[a-z]+@[a-z]+\.com",
+])
+def test_safe_patterns(pattern):
+    assert analyze_pattern(pattern) is None
+
+def test_invalid_pattern_is_left_to_compile():
+    assert analyze_pattern(r"(unclosed") is None
+
+def test_legacy_separator_is_rewritten():
+    pattern = "s" + LEGACY_SEPARATOR + "p"
+    assert rewrite_pattern(pattern) == "s" + SAFE_SEPARATOR + "p"
+    assert analyze_pattern(rewrite_pattern(pattern)) is None
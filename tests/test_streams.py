@@ -0,0 +1,157 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from aiogram.types import Update
+from bot.core.config import settings
+from bot.core.memory_cache import MemoryCache
+from bot.core.streams import UpdateConsumer, UpdateProducer, defer_ack, lease_key, run_polling_ingest, stream_key
+
+class FakeDispatcher:
+    def __init__(self, fail: set[int] = frozenset(), hold: asyncio.Event | None = None, defer: bool = False):
+        self.fail = fail
+        self.hold = hold
+        self.defer = defer
+        self.seen: list[int] = []
+        self.acks = []
+
+    async def feed_update(self, bot, update: Update):
+        self.seen.append(update.update_id)
+        if self.defer:
+            self.acks.append(defer_ack())
+        if self.hold is not None:
+            await self.hold.wait()
+        if update.update_id in self.fail:
+            raise RuntimeError("handler failed")
+
+    def resolve_used_update_types(self):
+        return ["message"]
+
+@pytest.fixture(autouse=True)
+def single_shard(monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_SHARDS", 1)
+    monkeypatch.setattr(settings, "UPDATE_WORKERS", 2)
+
+def pending(redis: MemoryCache) -> dict:
+    return redis.groups[(stream_key(0), settings.STREAM_GROUP)]["pending"]
+
+async def produce(redis: MemoryCache, *update_ids: int):
+    producer = UpdateProducer(redis)
+    for update_id in update_ids:
+        await producer.submit(Update(update_id=update_id))
+
+async def start(redis: MemoryCache, dp: FakeDispatcher, name: str = "a") -> tuple[UpdateConsumer, asyncio.Task]:
+    consumer = UpdateConsumer(redis, MagicMock(), dp, [0], name=name)
+    return consumer, asyncio.create_task(consumer.run())
+
+async def stop(task: asyncio.Task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+def test_updates_are_processed_and_acknowledged():
+    async def run():
+        redis = MemoryCache()
+        dp = FakeDispatcher()
+        await produce(redis, 1, 2, 3)
+        _, task = await start(redis, dp)
+        await asyncio.sleep(0.2)
+        await stop(task)
+        assert sorted(dp.seen) == [1, 2, 3]
+        assert pending(redis) == {}
+    asyncio.run(run())
+
+def test_failed_update_stays_pending():
+    async def run():
+        redis = MemoryCache()
+        dp = FakeDispatcher(fail={2})
+        await produce(redis, 1, 2)
+        _, task = await start(redis, dp)
+        await asyncio.sleep(0.2)
+        await stop(task)
+        assert len(pending(redis)) == 1
+    asyncio.run(run())
+
+def test_deferred_ack_is_left_to_the_handler():
+    async def run():
+        redis = MemoryCache()
+        dp = FakeDispatcher(defer=True)
+        await produce(redis, 1)
+        _, task = await start(redis, dp)
+        await asyncio.sleep(0.2)
+        assert len(pending(redis)) == 1
+        await dp.acks[0]()
+        assert pending(redis) == {}
+        await stop(task)
+    asyncio.run(run())
+
+def test_queued_entries_are_not_reclaimed(monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_CLAIM_IDLE_MS", 50)
+
+    async def run():
+        redis = MemoryCache()
+        hold = asyncio.Event()
+        dp = FakeDispatcher(hold=hold)
+        await produce(redis, 1, 2, 3, 4)
+        _, task = await start(redis, dp)
+        # Handlers are stuck, the entries go idle while queued in the executor
+        # (claims run between reads, which block for a second)
+        await asyncio.sleep(1.3)
+        hold.set()
+        await asyncio.sleep(0.1)
+        await stop(task)
+        assert sorted(dp.seen) == [1, 2, 3, 4]
+    asyncio.run(run())
+
+def test_failed_entry_is_reclaimed(monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_CLAIM_IDLE_MS", 50)
+
+    async def run():
+        redis = MemoryCache()
+        dp = FakeDispatcher(fail={1})
+        await produce(redis, 1)
+        _, task = await start(redis, dp)
+        await asyncio.sleep(1.3)
+        await stop(task)
+        # Redelivered after STREAM_CLAIM_IDLE_MS
+        assert dp.seen.count(1) >= 2
+    asyncio.run(run())
+
+def test_one_consumer_holds_the_lease():
+    async def run():
+        redis = MemoryCache()
+        first, second = FakeDispatcher(), FakeDispatcher()
+        _, task_a = await start(redis, first, name="a")
+        await asyncio.sleep(0.05)
+        _, task_b = await start(redis, second, name="b")
+        await produce(redis, 1, 2)
+        await asyncio.sleep(0.2)
+        assert await redis.get(lease_key(0)) == "a"
+        assert sorted(first.seen) == [1, 2] and second.seen == []
+        await stop(task_a)
+        await stop(task_b)
+    asyncio.run(run())
+
+def test_polling_ingest_retries_failed_push(monkeypatch):
+    async def run():
+        redis = MemoryCache()
+        producer = UpdateProducer(redis)
+        calls = []
+
+        async def xadd(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise ConnectionError("redis down")
+        redis.xadd = xadd
+
+        bot = AsyncMock()
+        bot.get_updates.side_effect = [[Update(update_id=7)], asyncio.CancelledError()]
+        sleeps = []
+
+        async def fast_sleep(delay):
+            sleeps.append(delay)
+        monkeypatch.setattr("bot.core.streams.asyncio.sleep", fast_sleep)
+
+        with pytest.raises(asyncio.CancelledError):
+            await run_polling_ingest(bot, FakeDispatcher(), producer)
+        assert sleeps == [1]
+        assert len(calls) == 2
+    asyncio.run(run())
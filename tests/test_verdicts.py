@@ -0,0 +1,38 @@
+from bot.core.models import Filter
+from bot.services.filter_set import ChatFilterSet, config_version
+from bot.services.verdicts import CLEAN, VerdictCache
+
+def make_filters(chat_id: int, action: str = "delete") -> list[Filter]:
+    return [
+        Filter(id=chat_id * 10 + 1, chat_id=chat_id, filter_type="keywords", pattern="spam, casino", action=action),
+        Filter(id=chat_id * 10 + 2, chat_id=chat_id, filter_type="regex", pattern=r"free\s+money", action=action),
+    ]
+
+def test_same_filters_share_a_version_across_chats():
+    # Row ids and chat ids do not matter, only what the filters do
+    assert config_version(make_filters(1)) == config_version(make_filters(2))
+
+def test_any_change_gives_a_new_version():
+    base = config_version(make_filters(1))
+    assert config_version(make_filters(1, action="ban")) != base
+    assert config_version(make_filters(1)[:1]) != base
+    assert config_version(list(reversed(make_filters(1)))) != base
+
+def test_verdict_is_reused_by_chats_with_the_same_filters():
+    cache = VerdictCache(maxsize=100, ttl=60)
+    first = ChatFilterSet(1, make_filters(1))
+    second = ChatFilterSet(2, make_filters(2))
+
+    cache.set(b"hash", first.version, 1)
+    index = cache.get(b"hash", second.version)
+    # The index points at the same filter in the other chat's set
+    assert second.compiled[index].pattern == r"free\s+money"
+    assert cache.get(b"hash", config_version(make_filters(1, action="ban"))) is None
+
+def test_clean_verdict_is_cached():
+    cache = VerdictCache(maxsize=100, ttl=60)
+    version = config_version(make_filters(1))
+    cache.set(b"clean", version, CLEAN)
+    assert cache.get(b"clean", version) == CLEAN
+    cache.clear()
+    assert cache.get(b"clean", version) is None